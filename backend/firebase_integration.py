@@ -0,0 +1,35 @@
+"""
+Optional Firebase / Firestore integration
+The firebase_admin and google-cloud import chain (grpc, protobuf) is heavy,
+so nothing is imported until the integration is enabled and first used
+"""
+
+import os
+from functools import lru_cache
+
+FIREBASE_ENABLED = os.environ.get("FIREBASE_ENABLED", "false").lower() == "true"
+# Path to a service account JSON file; application default credentials otherwise
+FIREBASE_CREDENTIALS = os.environ.get("FIREBASE_CREDENTIALS")
+
+@lru_cache(maxsize=None)
+def get_app():
+    if not FIREBASE_ENABLED:
+        raise RuntimeError("Firebase integration is disabled, set FIREBASE_ENABLED=true")
+
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if FIREBASE_CREDENTIALS:
+        cred = credentials.Certificate(FIREBASE_CREDENTIALS)
+    else:
+        cred = credentials.ApplicationDefault()
+    return firebase_admin.initialize_app(cred)
+
+def get_auth():
+    get_app()
+    from firebase_admin import auth
+    return auth
+
+def get_firestore():
+    from firebase_admin import firestore
+    return firestore.client(get_app())
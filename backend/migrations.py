@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Versioned data migrations
+    python migrations.py status    list migrations and their progress
+    python migrations.py up        run pending migrations in version order
+
+Each migration walks its collections in _id order in small batches and
+checkpoints the last _id in db.migrations after every batch, so an
+interrupted run resumes where it stopped. Batches are throttled to keep
+replication lag and cache pressure low on a live primary. The app reads
+both the old and new shapes, so migrations run without downtime.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import server
+
+# Only one runner at a time; renewed after every batch
+LEASE_SECONDS = 300
+
+def to_object_ids(fields):
+    """Batch transform rewriting string ids in the given fields as ObjectIds"""
+    async def transform(batch):
+        updates = []
+        for document in batch:
+            converted = {
+                field: ObjectId(document[field]) for field in fields
+                if isinstance(document.get(field), str) and ObjectId.is_valid(document[field])
+            }
+            if converted:
+                # Match the old values so a concurrent rewrite isn't clobbered
+                updates.append(UpdateOne(
+                    {"_id": document["_id"], **{field: document[field] for field in converted}},
+                    {"$set": converted}
+                ))
+        return updates
+    return transform
+
+def string_ids(fields) -> dict:
+    return {"$or": [{field: {"$type": "string"}} for field in fields]}
+
+async def backfill_usernames(batch):
+    user_ids = {document["user_id"] for document in batch}
+    users = await server.db.users.find(
+        {"_id": {"$in": [ObjectId(user_id) for user_id in map(str, user_ids) if ObjectId.is_valid(user_id)]}},
+        {"username": 1, "verified_role": 1, "role": 1}
+    ).to_list(None)
+    by_id = {str(user["_id"]): user for user in users}
+    return [
+        UpdateOne({"_id": document["_id"]}, {"$set": {
+            "username": user["username"],
+            "user_role": user.get("verified_role", user["role"])
+        }})
+        for document in batch
+        if (user := by_id.get(str(document["user_id"])))
+    ]
+
+INTERACTION_FIELDS = ("content_id", "user_id")
+
+# Content counter each like adds to, whether hot or archived
+DUPLICATE_COUNTERS = {"likes": "likes_count", "likes_archive": "likes_count"}
+
+async def remove_duplicates(collection: str, documents: list) -> int:
+    """Delete legacy copies whose converted form already exists, taking back the count each added"""
+    removed = 0
+    for document in documents:
+        # Match the old values, which also carry the shard key
+        result = await server.db[collection].delete_one(
+            {"_id": document["_id"], **{field: document[field] for field in INTERACTION_FIELDS if field in document}}
+        )
+        if not result.deleted_count:
+            continue
+        removed += 1
+        if collection in DUPLICATE_COUNTERS:
+            await server.db.contents.update_one(
+                {"_id": server.fk_value(str(document["content_id"]))},
+                {"$inc": {DUPLICATE_COUNTERS[collection]: -1}}
+            )
+    return removed
+
+# (version, name, [(collection, query, projection, transform)])
+MIGRATIONS = [
+    (1, "interaction_references_to_object_ids", [
+        (collection, string_ids(INTERACTION_FIELDS), {field: 1 for field in INTERACTION_FIELDS}, to_object_ids(INTERACTION_FIELDS))
+        for collection in server.SHARD_KEYS
+    ]),
+    (2, "content_owner_to_object_id", [
+        ("contents", string_ids(["user_id"]), {"user_id": 1}, to_object_ids(["user_id"]))
+    ]),
+    (3, "backfill_content_usernames", [
+        ("contents", {"username": {"$exists": False}}, {"user_id": 1}, backfill_usernames)
+    ])
+]
+
+async def renew_lease():
+    await server.db.rollups.update_one(
+        {"_id": "migrations"},
+        {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)}}
+    )
+
+async def run_step(version: int, collection: str, query: dict, projection: dict, transform, args) -> dict:
+    """Walk one collection from its checkpoint, applying transform batch by batch"""
+    state_id = f"{version}:{collection}"
+    state = await server.db.migrations.find_one({"_id": state_id}) or {}
+    last_id = state.get("last_id")
+    stats = {key: state.get(key, 0) for key in ("matched", "modified", "duplicates", "removed_duplicates")}
+
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        started = time.monotonic()
+        batch = await server.db[collection].find(batch_query, projection).sort("_id", 1).limit(
+            args.batch_size
+        ).to_list(args.batch_size)
+        if not batch:
+            return stats
+
+        updates = await transform(batch)
+        if updates:
+            try:
+                result = await server.db[collection].bulk_write(updates, ordered=False)
+                stats["modified"] += result.modified_count
+            except BulkWriteError as e:
+                errors = e.details["writeErrors"]
+                if any(error["code"] != 11000 for error in errors):
+                    raise
+                # The same like or save exists in both forms; the converted copy wins
+                # and the legacy one goes
+                stats["modified"] += e.details["nModified"]
+                stats["duplicates"] += len(errors)
+                by_id = {document["_id"]: document for document in batch}
+                stats["removed_duplicates"] += await remove_duplicates(
+                    collection, [by_id[updates[error["index"]]._filter["_id"]] for error in errors]
+                )
+        stats["matched"] += len(batch)
+        last_id = batch[-1]["_id"]
+
+        await server.db.migrations.update_one(
+            {"_id": state_id},
+            {"$set": {"last_id": last_id, **stats, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        await renew_lease()
+
+        # Throttle: fixed pause plus whatever keeps us under --max-docs-per-second
+        elapsed = time.monotonic() - started
+        floor = len(batch) / args.max_docs_per_second if args.max_docs_per_second else 0
+        await asyncio.sleep(max(args.pause, floor - elapsed))
+
+async def up(args) -> dict:
+    if await server.acquire_lease("migrations", LEASE_SECONDS) is None:
+        raise SystemExit("Another migration runner holds the lease")
+
+    report = {}
+    try:
+        for version, name, steps in MIGRATIONS:
+            if args.to is not None and version > args.to:
+                break
+            if await server.db.migrations.find_one({"_id": version, "status": "done"}):
+                continue
+
+            start = time.perf_counter()
+            await server.db.migrations.update_one(
+                {"_id": version},
+                {"$set": {"name": name, "status": "running", "started_at": datetime.utcnow()}},
+                upsert=True
+            )
+            results = {}
+            for collection, query, projection, transform in steps:
+                results[collection] = await run_step(version, collection, query, projection, transform, args)
+            await server.db.migrations.update_one(
+                {"_id": version},
+                {"$set": {"status": "done", "finished_at": datetime.utcnow(), "results": results}}
+            )
+            report[f"{version}_{name}"] = {"seconds": round(time.perf_counter() - start, 2), **results}
+    finally:
+        await server.db.rollups.update_one({"_id": "migrations"}, {"$set": {"lease_until": datetime.utcnow()}})
+    return report
+
+async def status() -> dict:
+    states = {state["_id"]: state async for state in server.db.migrations.find()}
+    report = {}
+    for version, name, steps in MIGRATIONS:
+        report[f"{version}_{name}"] = {
+            "status": states.get(version, {}).get("status", "pending"),
+            "progress": {
+                collection: {key: step[key] for key in ("matched", "modified", "removed_duplicates", "last_id") if key in step}
+                for collection, *_ in steps
+                if (step := states.get(f"{version}:{collection}"))
+            }
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["status", "up"])
+    parser.add_argument("--to", type=int, help="Stop after this version")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="Minimum seconds between batches")
+    parser.add_argument("--max-docs-per-second", type=float, default=5000)
+    args = parser.parse_args()
+
+    result = asyncio.run(up(args) if args.command == "up" else status())
+    print(json.dumps(result, indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Production entrypoint
+Runs the API under uvicorn with one worker process per available core.
+Each worker keeps its own caches and Mongo pool and warms them during
+startup, before it accepts connections. SIGTERM stops accepting new
+connections, lets in-flight requests finish and flushes buffered writes.
+"""
+
+import importlib.util
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+ROOT_DIR = Path(__file__).parent
+
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "8001"))
+# Seconds to wait for in-flight requests after SIGTERM
+GRACEFUL_TIMEOUT_SECONDS = int(os.environ.get("GRACEFUL_TIMEOUT_SECONDS", "20"))
+KEEPALIVE_SECONDS = int(os.environ.get("KEEPALIVE_SECONDS", "5"))
+# Proxies trusted to set X-Forwarded-For / X-Forwarded-Proto
+FORWARDED_ALLOW_IPS = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+logger = logging.getLogger("drezzle.run")
+
+def available_cores() -> int:
+    try:
+        # Respects CPU affinity set by the container or taskset
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def worker_count() -> int:
+    return max(1, int(os.environ.get("WEB_CONCURRENCY") or available_cores()))
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    workers = worker_count()
+
+    if workers > 1:
+        # Workers write metric samples to a shared directory so /metrics can aggregate them
+        if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="drezzle-metrics-")
+        if os.environ.get("RATE_LIMIT_BACKEND", "memory") == "memory":
+            logger.warning("In-memory rate limits apply per worker; set RATE_LIMIT_BACKEND=mongo to share them")
+
+    loop = "uvloop" if installed("uvloop") else "asyncio"
+    http = "httptools" if installed("httptools") else "h11"
+    logger.info("Starting %d workers on %s:%d (loop=%s, http=%s)", workers, HOST, PORT, loop, http)
+
+    uvicorn.run(
+        "server:app",
+        app_dir=str(ROOT_DIR),
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        timeout_keep_alive=KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT_SECONDS,
+    )
+
+if __name__ == "__main__":
+    main()
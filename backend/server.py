@@ -1,7 +1,9 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, status, UploadFile, File
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
@@ -12,29 +14,341 @@ import uuid
 from datetime import datetime, timedelta
 import jwt
 from passlib.context import CryptContext
-import json
-import base64
-from bson import ObjectId
-import firebase_admin
-from firebase_admin import credentials, auth as firebase_auth
-from google.cloud import firestore
+from bson import Binary, ObjectId
+import pymongo
+from pymongo import ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from pymongo.errors import ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError, WaitQueueTimeoutError
 import asyncio
+import hashlib
+import math
+import zlib
+import re
+import bisect
+import heapq
+from collections import Counter, deque
+import time
+from cachetools import TTLCache
+from contextvars import Context, ContextVar
+import threading
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter as MetricCounter, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+import firebase_integration
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics
+HTTP_REQUESTS = MetricCounter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+HTTP_REQUEST_SIZE = Histogram(
+    "http_request_size_bytes", "HTTP request body size", ["route"], buckets=PAYLOAD_BUCKETS
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size", ["route"], buckets=PAYLOAD_BUCKETS
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ["command", "collection", "route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5)
+)
+MONGO_COMMAND_FAILURES = MetricCounter(
+    "mongo_command_failures_total", "Failed MongoDB commands", ["command", "route"]
+)
+MONGO_POOL_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["outcome"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+MONGO_TIMEOUTS = MetricCounter(
+    "mongo_timeouts_total", "Requests failed by a database timeout", ["route", "error"]
+)
+RATE_LIMIT_REJECTIONS = MetricCounter(
+    "rate_limit_rejections_total", "Requests rejected by rate limiting", ["rule"]
+)
+
+# Requests issuing more commands or spending longer in the database than
+# this are logged with a trace of their commands
+DB_TRACE_MAX_QUERIES = int(os.environ.get("DB_TRACE_MAX_QUERIES", "25"))
+DB_TRACE_MAX_MS = float(os.environ.get("DB_TRACE_MAX_MS", "250"))
+DB_TRACE_REPEAT_THRESHOLD = int(os.environ.get("DB_TRACE_REPEAT_THRESHOLD", "10"))
+
+# ASGI scope of the request being handled, used to attribute database commands
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+
+class RequestTrace:
+    """Database commands issued while handling one request"""
+
+    def __init__(self):
+        self.commands = []
+
+    def record(self, command: str, collection: str, duration_ms: float):
+        self.commands.append((command, collection, duration_ms))
+
+    @property
+    def db_ms(self) -> float:
+        return sum(duration for _, _, duration in self.commands)
+
+    def repeated(self) -> List[str]:
+        # The same command on the same collection over and over is the N+1 signature
+        counts = Counter(f"{command}:{collection}" for command, collection, _ in self.commands)
+        return [key for key, count in counts.items() if count >= DB_TRACE_REPEAT_THRESHOLD]
+
+    def summary(self) -> str:
+        # Collapse runs of identical commands: "find:contents x20 (31.2ms)"
+        runs = []
+        for command, collection, duration in self.commands:
+            key = f"{command}:{collection}"
+            if runs and runs[-1][0] == key:
+                runs[-1][1] += 1
+                runs[-1][2] += duration
+            else:
+                runs.append([key, 1, duration])
+        return ", ".join(
+            f"{key} x{count} ({duration:.1f}ms)" if count > 1 else f"{key} ({duration:.1f}ms)"
+            for key, count, duration in runs
+        )
+
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+def route_label(scope: Optional[dict]) -> str:
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return route.path if route else "unmatched"
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command and attributes it to the current route"""
+
+    def __init__(self):
+        self.collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self.collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self.collections.pop(event.request_id, "")
+        MONGO_COMMAND_LATENCY.labels(
+            event.command_name, collection, route_label(current_scope.get())
+        ).observe(event.duration_micros / 1e6)
+        self._trace(event, collection)
+
+    def failed(self, event):
+        collection = self.collections.pop(event.request_id, "")
+        MONGO_COMMAND_FAILURES.labels(event.command_name, route_label(current_scope.get())).inc()
+        self._trace(event, collection)
+
+    def _trace(self, event, collection: str):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.record(event.command_name, collection, event.duration_micros / 1000)
+
+command_metrics = CommandMetrics()
+
+class PoolUsage(monitoring.ConnectionPoolListener):
+    """Tracks connections checked out of each server's pool"""
+
+    def __init__(self):
+        self.checked_out = Counter()
+        # Checkout starts and finishes on the same driver thread
+        self.waits = threading.local()
+
+    def connection_check_out_started(self, event):
+        self.waits.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self.checked_out[event.address] += 1
+        self._observe_wait("acquired")
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait(event.reason)
+
+    def _observe_wait(self, outcome: str):
+        started = getattr(self.waits, "started", None)
+        if started is not None:
+            MONGO_POOL_WAIT.labels(outcome).observe(time.perf_counter() - started)
+            self.waits.started = None
+
+    def connection_checked_in(self, event):
+        self.checked_out[event.address] -= 1
+
+    def pool_cleared(self, event):
+        self.checked_out[event.address] = 0
+
+    def pool_closed(self, event):
+        self.checked_out.pop(event.address, None)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+pool_usage = PoolUsage()
+
 # MongoDB connection
+# Bounded pool and wait queue so overload fails fast instead of queueing
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_CONNECTING = int(os.environ.get("MONGO_MAX_CONNECTING", "2"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "1000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+# Connections opened at startup so the first requests don't pay for handshakes
+MONGO_WARM_CONNECTIONS = int(os.environ.get("MONGO_WARM_CONNECTIONS", "4"))
+
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxConnecting=MONGO_MAX_CONNECTING,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    event_listeners=[command_metrics, pool_usage]
+)
 db = client[os.environ['DB_NAME']]
 
+# Read routing
+# Endpoints that tolerate slightly stale data read through read_db, which
+# may be served by a secondary. max staleness must be at least 90 seconds.
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest
+}
+MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "secondaryPreferred")
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get("MONGO_MAX_STALENESS_SECONDS", "90"))
+# After writing, a client reads from the primary for this long so it sees its own changes
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", str(MONGO_MAX_STALENESS_SECONDS)))
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+if MONGO_READ_PREFERENCE == "primary":
+    read_preference = Primary()
+else:
+    read_preference = READ_PREFERENCES[MONGO_READ_PREFERENCE](max_staleness=MONGO_MAX_STALENESS_SECONDS)
+read_db = client.get_database(os.environ['DB_NAME'], read_preference=read_preference)
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # JWT Configuration
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "drezzle-secret-key-2025")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+REVOCATION_REFRESH_SECONDS = float(os.environ.get("REVOCATION_REFRESH_SECONDS", "15"))
+
+# Text fields at least this large are stored zlib-compressed
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "512"))
+COMPRESSION_LEVEL = int(os.environ.get("COMPRESSION_LEVEL", "6"))
+
+# Responses at least this large are gzip-compressed for clients that accept it
+GZIP_MIN_BYTES = int(os.environ.get("GZIP_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+
+# Feed ranking
+FEED_HALF_LIFE_HOURS = float(os.environ.get("FEED_HALF_LIFE_HOURS", "24"))
+FEED_REFRESH_SECONDS = float(os.environ.get("FEED_REFRESH_SECONDS", "60"))
+# Each refresh re-reads this far behind the last one: created_at is stamped
+# by the app before the insert lands, so late writes would otherwise be missed
+FEED_REFRESH_OVERLAP_SECONDS = float(os.environ.get("FEED_REFRESH_OVERLAP_SECONDS", "30"))
+# Unlikes and unsaves are kept this long for every worker's ranker to subtract
+FEED_RETRACTION_TTL_SECONDS = int(os.environ.get("FEED_RETRACTION_TTL_SECONDS", "86400"))
+
+# Following timelines
+TIMELINE_MAX_ITEMS = int(os.environ.get("TIMELINE_MAX_ITEMS", "500"))
+TIMELINE_BACKFILL_ITEMS = int(os.environ.get("TIMELINE_BACKFILL_ITEMS", "20"))
+FANOUT_MAX_FOLLOWERS = int(os.environ.get("FANOUT_MAX_FOLLOWERS", "10000"))
+FANOUT_BATCH_SIZE = int(os.environ.get("FANOUT_BATCH_SIZE", "1000"))
+
+# Search
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL_SECONDS = float(os.environ.get("SEARCH_CACHE_TTL_SECONDS", "30"))
+SEARCH_MAX_PREFIX_TERMS = int(os.environ.get("SEARCH_MAX_PREFIX_TERMS", "50"))
+
+# Trending leaderboards
+TRENDING_TOP_K = int(os.environ.get("TRENDING_TOP_K", "100"))
+TRENDING_RESYNC_SECONDS = float(os.environ.get("TRENDING_RESYNC_SECONDS", "300"))
+
+# Creator profiles
+PROFILE_CACHE_SIZE = int(os.environ.get("PROFILE_CACHE_SIZE", "256"))
+PROFILE_CACHE_TTL_SECONDS = float(os.environ.get("PROFILE_CACHE_TTL_SECONDS", "15"))
+PROFILE_MAX_PAGE_SIZE = int(os.environ.get("PROFILE_MAX_PAGE_SIZE", "50"))
+
+# Username changes
+USERNAME_FANOUT_BATCH_SIZE = int(os.environ.get("USERNAME_FANOUT_BATCH_SIZE", "500"))
+USERNAME_FANOUT_PAUSE_SECONDS = float(os.environ.get("USERNAME_FANOUT_PAUSE_SECONDS", "0.05"))
+USERNAME_JOB_LEASE_SECONDS = float(os.environ.get("USERNAME_JOB_LEASE_SECONDS", "60"))
+USERNAME_JOB_POLL_SECONDS = float(os.environ.get("USERNAME_JOB_POLL_SECONDS", "30"))
+
+# Playback events
+EVENTS_MAX_BATCH = int(os.environ.get("EVENTS_MAX_BATCH", "500"))
+EVENTS_MAX_BUFFER = int(os.environ.get("EVENTS_MAX_BUFFER", "100000"))
+EVENTS_FLUSH_SIZE = int(os.environ.get("EVENTS_FLUSH_SIZE", "1000"))
+EVENTS_FLUSH_SECONDS = float(os.environ.get("EVENTS_FLUSH_SECONDS", "5"))
+EVENTS_BUCKET_SECONDS = int(os.environ.get("EVENTS_BUCKET_SECONDS", "60"))
+EVENTS_ROLLUP_SECONDS = float(os.environ.get("EVENTS_ROLLUP_SECONDS", "60"))
+# Raw events expire once long rolled up into content counters
+EVENTS_TTL_DAYS = float(os.environ.get("EVENTS_TTL_DAYS", "7"))
+
+# Engagement archival
+# Likes, saves and comments older than the horizon move to *_archive collections
+ARCHIVE_HORIZON_DAYS = float(os.environ.get("ARCHIVE_HORIZON_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_BATCH_PAUSE_SECONDS = float(os.environ.get("ARCHIVE_BATCH_PAUSE_SECONDS", "0.1"))
+ARCHIVE_INTERVAL_SECONDS = float(os.environ.get("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Rate limiting
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")  # memory or mongo
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Database time budget per request, covering pool wait, server selection and
+# maxTimeMS of every command. Override per route template with
+# MONGO_ROUTE_TIMEOUTS_MS="/api/admin/stats=5000,/api/search=1000"; 0 disables.
+MONGO_DEFAULT_TIMEOUT_MS = int(os.environ.get("MONGO_DEFAULT_TIMEOUT_MS", "2000"))
+MONGO_ROUTE_TIMEOUTS_MS = {
+    "/api/admin/stats": 5000,
+    "/api/admin/pending-verifications": 5000,
+    "/metrics": 0
+}
+for budget in filter(None, os.environ.get("MONGO_ROUTE_TIMEOUTS_MS", "").split(",")):
+    route, _, timeout_ms = budget.partition("=")
+    MONGO_ROUTE_TIMEOUTS_MS[route.strip()] = int(timeout_ms)
+
+# Health checks
+HEALTH_CACHE_SECONDS = float(os.environ.get("HEALTH_CACHE_SECONDS", "2"))
+HEALTH_PING_TIMEOUT_SECONDS = float(os.environ.get("HEALTH_PING_TIMEOUT_SECONDS", "1"))
+HEALTH_MAX_LOOP_LAG_MS = float(os.environ.get("HEALTH_MAX_LOOP_LAG_MS", "200"))
+HEALTH_MAX_POOL_SATURATION = float(os.environ.get("HEALTH_MAX_POOL_SATURATION", "0.9"))
+LOOP_LAG_INTERVAL_SECONDS = 0.5
+
+# How long shutdown waits for in-flight background jobs such as timeline fan-out
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", "10"))
+
+# How often to check whether migrations.py has converted legacy string references
+LEGACY_IDS_CHECK_SECONDS = float(os.environ.get("LEGACY_IDS_CHECK_SECONDS", "300"))
 
 # Security
 security = HTTPBearer()
@@ -122,6 +436,8 @@ class Content(BaseModel):
     duration: Optional[float] = None
     likes_count: int = 0
     comments_count: int = 0
+    plays_count: int = 0
+    completions_count: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Comment(BaseModel):
@@ -157,9 +473,63 @@ class LabelRequestCreate(BaseModel):
     label_name: str
     description: str
 
+class PlaybackEvent(BaseModel):
+    content_id: str
+    type: str  # play, seek, complete
+    position: Optional[float] = None  # seconds into the track
+    timestamp: Optional[datetime] = None  # client-side time of the event
+
+class PlaybackEventBatch(BaseModel):
+    events: List[PlaybackEvent]
+
+class TrendingEntry(BaseModel):
+    score: int
+    content: Content
+
+class UserProfile(BaseModel):
+    id: str
+    username: str
+    role: str
+    verified_role: str
+    is_verified: bool = False
+    followers_count: int = 0
+    following_count: int = 0
+    total_uploads: int = 0
+    total_likes: int = 0
+    total_comments: int = 0
+    contents: List[Content] = []
+    created_at: datetime
+
+class UsernameChange(BaseModel):
+    username: str
+
+class UsernameJob(BaseModel):
+    """Progress of rewriting a user's denormalized username"""
+    id: str
+    status: str  # pending, running, done, superseded
+    old_username: str
+    new_username: str
+    progress: dict = {}
+    totals: dict = {}
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+class Principal(BaseModel):
+    """Identity and role carried by an access token"""
+    id: str
+    username: str
+    role: str
+    verified_role: str
+    is_verified: bool = False
+
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 # Helper functions
 def hash_password(password: str) -> str:
@@ -171,19 +541,96 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": time.time(), "type": "access"})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+def duplicate_key_field(error: DuplicateKeyError) -> Optional[str]:
+    """Name of the field whose unique index rejected a write"""
+    key_pattern = (error.details or {}).get("keyPattern")
+    if key_pattern:
+        return next(iter(key_pattern))
+    match = re.search(r"index: (\w+?)_-?1", str(error))
+    return match.group(1) if match else None
+
+def access_claims(user: dict) -> dict:
+    return {
+        "sub": str(user["_id"]),
+        "username": user["username"],
+        "role": user["role"],
+        "verified_role": user.get("verified_role", user["role"]),
+        "is_verified": user.get("is_verified", False)
+    }
+
+async def create_refresh_token(user_id: str) -> str:
+    token_id = uuid.uuid4().hex
+    expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    await db.refresh_tokens.insert_one({
+        "_id": token_id,
+        "user_id": user_id,
+        "expires_at": expire,
+        "created_at": datetime.utcnow()
+    })
+    return jwt.encode({"sub": user_id, "jti": token_id, "type": "refresh", "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+async def issue_tokens(user: dict) -> dict:
+    return {
+        "access_token": create_access_token(data=access_claims(user)),
+        "refresh_token": await create_refresh_token(str(user["_id"])),
+        "token_type": "bearer"
+    }
+
+class TokenRevocations:
+    """Users whose access tokens issued before a given time are no longer valid.
+
+    Kept in memory so principals are checked without a database round trip;
+    refresh() picks up revocations made by other workers.
+    """
+
+    def __init__(self):
+        self.revoked = {}
+        self.last_refresh = None
+
+    def is_revoked(self, user_id: str, issued_at: float) -> bool:
+        return issued_at <= self.revoked.get(user_id, 0)
+
+    async def revoke(self, user_id: str):
+        revoked_at = time.time()
+        self.revoked[user_id] = revoked_at
+        await db.token_revocations.update_one(
+            {"_id": user_id},
+            {"$set": {
+                "revoked_at": revoked_at,
+                "updated_at": datetime.utcnow(),
+                "expires_at": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+            }},
+            upsert=True
+        )
+
+    async def refresh(self):
+        now = datetime.utcnow()
+        query = {"updated_at": {"$gt": self.last_refresh}} if self.last_refresh else {}
+        async for revocation in db.token_revocations.find(query):
+            self.revoked[revocation["_id"]] = max(self.revoked.get(revocation["_id"], 0), revocation["revoked_at"])
+        
+        # Tokens older than an access token lifetime have expired anyway
+        horizon = time.time() - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        self.revoked = {user_id: revoked_at for user_id, revoked_at in self.revoked.items() if revoked_at > horizon}
+        self.last_refresh = now
+
+token_revocations = TokenRevocations()
+
+def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("sub") is None or payload.get("type", "access") != "access":
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    user_id: str = decode_access_token(credentials.credentials)["sub"]
     
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if user is None:
@@ -201,24 +648,1202 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         created_at=user["created_at"]
     )
 
-def require_admin(current_user: User = Depends(get_current_user)):
+async def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Authorize from token claims alone, without loading the user"""
+    payload = decode_access_token(credentials.credentials)
+    
+    if "verified_role" not in payload:
+        # Tokens issued before role claims existed
+        user = await get_current_user(credentials)
+        return Principal(**user.model_dump())
+    
+    if token_revocations.is_revoked(payload["sub"], payload.get("iat", 0)):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    
+    return Principal(
+        id=payload["sub"],
+        username=payload["username"],
+        role=payload["role"],
+        verified_role=payload["verified_role"],
+        is_verified=payload.get("is_verified", False)
+    )
+
+def require_admin(current_user: Principal = Depends(get_current_principal)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
-# Auth Routes
-@api_router.post("/auth/register", response_model=Token)
-async def register(user_data: UserCreate):
-    # Check if user exists
-    existing_user = await db.users.find_one({"email": user_data.email})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="User already exists")
+def compress_text(value: Optional[str]):
+    """Return large text as compressed binary, leaving small values untouched"""
+    if value is None:
+        return None
+    raw = value.encode("utf-8")
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        return value
+    packed = zlib.compress(raw, COMPRESSION_LEVEL)
+    if len(packed) >= len(raw):
+        return value
+    return Binary(packed)
+
+def decompress_text(value) -> Optional[str]:
+    # Compressed fields come back from Mongo as bytes, plain ones as str
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+# Media blob storage
+# Media and verification documents are stored once per distinct payload in
+# db.media_blobs, keyed by SHA-256, and referenced by hash from contents/users.
+MEDIA_FIELDS = ("audio_data", "video_data", "cover_image")
+
+def blob_hash(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+async def store_blob(data: Optional[str], compress: bool = False) -> Optional[str]:
+    """Store a base64 payload (or reference an existing copy) and return its id"""
+    if not data:
+        return None
+
+    blob_id = blob_hash(data)
+
+    # Reference an existing copy without sending the payload again
+    existing = await db.media_blobs.find_one_and_update(
+        {"_id": blob_id},
+        {"$inc": {"ref_count": 1}},
+        projection={"_id": 1}
+    )
+    if existing:
+        return blob_id
+
+    try:
+        await db.media_blobs.insert_one({
+            "_id": blob_id,
+            "data": compress_text(data) if compress else data,
+            "size": len(data),
+            "ref_count": 1,
+            "created_at": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        # Someone stored the same payload concurrently
+        await db.media_blobs.update_one({"_id": blob_id}, {"$inc": {"ref_count": 1}})
+
+    return blob_id
+
+async def release_blob(blob_id: Optional[str]):
+    """Drop one reference to a blob and free it once the last one is gone"""
+    if not blob_id:
+        return
+
+    blob = await db.media_blobs.find_one_and_update(
+        {"_id": blob_id},
+        {"$inc": {"ref_count": -1}},
+        projection={"ref_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if blob and blob["ref_count"] <= 0:
+        await db.media_blobs.delete_one({"_id": blob_id, "ref_count": {"$lte": 0}})
+
+async def load_blobs(blob_ids) -> dict:
+    blob_ids = list({blob_id for blob_id in blob_ids if blob_id})
+    if not blob_ids:
+        return {}
+    blobs = await db.media_blobs.find({"_id": {"$in": blob_ids}}).to_list(len(blob_ids))
+    return {blob["_id"]: decompress_text(blob["data"]) for blob in blobs}
+
+async def attach_media(contents: list):
+    """Fill media fields of content documents from their blob references"""
+    blobs = await load_blobs(
+        blob_id
+        for content in contents
+        for blob_id in content.get("media_refs", {}).values()
+    )
+    for content in contents:
+        for field, blob_id in content.get("media_refs", {}).items():
+            content[field] = blobs.get(blob_id)
+
+def build_content(content: dict) -> Content:
+    return Content(
+        id=str(content["_id"]),
+        user_id=str(content["user_id"]),
+        title=content["title"],
+        description=decompress_text(content.get("description")),
+        content_type=content.get("content_type", "audio"),
+        audio_data=content.get("audio_data"),
+        video_data=content.get("video_data"),
+        cover_image=content.get("cover_image"),
+        duration=content.get("duration"),
+        likes_count=content.get("likes_count", 0),
+        comments_count=content.get("comments_count", 0),
+        plays_count=content.get("plays_count", 0),
+        completions_count=content.get("completions_count", 0),
+        created_at=content["created_at"]
+    )
+
+# Foreign keys
+# contents.user_id and the content_id/user_id of likes, saved_contents and
+# comments are stored as ObjectIds. Rows written before that keep strings
+# until migrations.py converts them, so lookups match both forms until
+# migrations 1 and 2 are recorded as done.
+LEGACY_ID_MIGRATIONS = (1, 2)
+legacy_string_ids = True
+
+async def refresh_legacy_string_ids():
+    global legacy_string_ids
+    if legacy_string_ids:
+        done = await db.migrations.count_documents({"_id": {"$in": list(LEGACY_ID_MIGRATIONS)}, "status": "done"})
+        legacy_string_ids = done < len(LEGACY_ID_MIGRATIONS)
+
+def fk_value(value: str):
+    """Stored form of a reference to a user or content id"""
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+def fk_forms(value: str) -> list:
+    if not ObjectId.is_valid(value):
+        return [value]
+    return [ObjectId(value), value] if legacy_string_ids else [ObjectId(value)]
+
+def fk_match(value: str):
+    """Query matching a reference stored as ObjectId or, until migrated, as its legacy string"""
+    forms = fk_forms(value)
+    return {"$in": forms} if len(forms) > 1 else forms[0]
+
+def fk_in(values: List[str]) -> dict:
+    return {"$in": [form for value in values for form in fk_forms(value)]}
+
+# Shard keys for the interaction collections. Each is hashed on the field
+# every hot lookup filters by equality, so like toggles and comment pages
+# (content_id) and saved listings (user_id) hit a single shard.
+SHARD_KEYS = {
+    "likes": {"content_id": "hashed"},
+    "likes_archive": {"content_id": "hashed"},
+    "comments": {"content_id": "hashed"},
+    "comments_archive": {"content_id": "hashed"},
+    "saved_contents": {"user_id": "hashed"},
+    "saved_contents_archive": {"user_id": "hashed"}
+}
+
+async def load_contents(content_ids: List[str], source=None) -> List[dict]:
+    """Fetch content documents in the given order, skipping deleted ones"""
+    source = db if source is None else source
+    contents = await source.contents.find(
+        {"_id": {"$in": [ObjectId(content_id) for content_id in content_ids]}}
+    ).to_list(len(content_ids))
+    position = {content_id: index for index, content_id in enumerate(content_ids)}
+    contents.sort(key=lambda content: position[str(content["_id"])])
+    return contents
+
+# Conditional requests
+# Counters that change a content card without changing its created_at
+CONTENT_COUNTERS = ("likes_count", "comments_count", "plays_count", "completions_count")
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    # Weak, so the tag still holds for the gzip-encoded representation
+    return f'W/"{digest}"'
+
+def content_etag(contents: list, *params) -> str:
+    return weak_etag(params, [
+        (str(content["_id"]), content["created_at"], *(content.get(counter, 0) for counter in CONTENT_COUNTERS))
+        for content in contents
+    ])
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 response if the client already holds this representation"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if "*" in candidates or etag.removeprefix("W/") in candidates:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+# Feed ranking
+# Engagement weights per collection; the upload itself counts as a freshness prior
+FEED_WEIGHTS = {
+    "contents": 1.0,
+    "likes": 1.0,
+    "saved_contents": 2.0,
+    "comments": 3.0
+}
+
+class FeedRanker:
+    """In-memory index of time-decayed engagement scores.
+
+    Every event adds weight * exp(decay * (t - reference)). All scores share
+    the same reference time, so ordering them equals ordering the decayed
+    scores at any later moment and refreshes only need to add new events.
+    Removed likes and saves are logged in db.feed_retractions so every
+    worker subtracts them on its next refresh.
+    """
+
+    def __init__(self, half_life_hours: float):
+        self.decay = math.log(2) / (half_life_hours * 3600)
+        self.reference = datetime.utcnow()
+        self.scores = {}
+        self.ranked = []
+        self.last_refresh = None
+        # Events and retractions already applied inside the overlap window
+        self.counted = {}
+        self.retracted = {}
+
+    def _rebase(self, now: datetime):
+        # Move the reference forward before the exponents overflow
+        shift = math.exp(-self.decay * (now - self.reference).total_seconds())
+        self.scores = {content_id: score * shift for content_id, score in self.scores.items()}
+        self.reference = now
+
+    def _weight(self, collection: str, at: datetime) -> float:
+        return FEED_WEIGHTS[collection] * math.exp(self.decay * (at - self.reference).total_seconds())
+
+    async def _load(self, now: datetime):
+        """Score all history, grouped in the database"""
+        for collection, weight in FEED_WEIGHTS.items():
+            key = "$_id" if collection == "contents" else "$content_id"
+            pipeline = [
+                {"$match": {"created_at": {"$lte": now}}},
+                {"$group": {"_id": key, "score": {"$sum": {"$exp": {"$multiply": [
+                    {"$subtract": ["$created_at", self.reference]},
+                    self.decay / 1000
+                ]}}}}}
+            ]
+            async for item in db[collection].aggregate(pipeline):
+                content_id = str(item["_id"])
+                self.scores[content_id] = self.scores.get(content_id, 0.0) + weight * item["score"]
+
+        # Remember the tail so the next refresh doesn't count it twice
+        overlap = {"$gt": now - timedelta(seconds=FEED_REFRESH_OVERLAP_SECONDS), "$lte": now}
+        for collection in FEED_WEIGHTS:
+            async for event in db[collection].find({"created_at": overlap}, {"created_at": 1}):
+                self.counted[(collection, event["_id"])] = event["created_at"]
+
+    def _was_counted(self, retraction: dict) -> bool:
+        if (retraction["collection"], retraction.get("engagement_id")) in self.counted:
+            return True
+        # Older than the overlap: any refresh since it was written has seen it
+        return retraction["created_at"] <= self.last_refresh - timedelta(seconds=FEED_REFRESH_OVERLAP_SECONDS)
+
+    async def _catch_up(self, now: datetime):
+        window = {"$gt": self.last_refresh - timedelta(seconds=FEED_REFRESH_OVERLAP_SECONDS), "$lte": now}
+
+        # Judge retractions against what earlier refreshes counted
+        async for retraction in db.feed_retractions.find({"removed_at": window}):
+            if retraction["_id"] in self.retracted:
+                continue
+            self.retracted[retraction["_id"]] = retraction["removed_at"]
+            content_id = retraction["content_id"]
+            if content_id in self.scores and self._was_counted(retraction):
+                retracted = self._weight(retraction["collection"], retraction["created_at"])
+                self.scores[content_id] = max(self.scores[content_id] - retracted, 0.0)
+
+        for collection in FEED_WEIGHTS:
+            projection = {"created_at": 1} if collection == "contents" else {"content_id": 1, "created_at": 1}
+            async for event in db[collection].find({"created_at": window}, projection):
+                key = (collection, event["_id"])
+                if key in self.counted:
+                    continue
+                self.counted[key] = event["created_at"]
+                content_id = str(event["_id"] if collection == "contents" else event["content_id"])
+                self.scores[content_id] = self.scores.get(content_id, 0.0) + self._weight(collection, event["created_at"])
+
+    async def refresh(self):
+        now = datetime.utcnow()
+        if self.decay * (now - self.reference).total_seconds() > 300:
+            self._rebase(now)
+
+        if self.last_refresh is None:
+            await self._load(now)
+        else:
+            await self._catch_up(now)
+
+        horizon = now - timedelta(seconds=FEED_REFRESH_OVERLAP_SECONDS)
+        self.counted = {key: at for key, at in self.counted.items() if at > horizon}
+        self.retracted = {key: at for key, at in self.retracted.items() if at > horizon}
+        self.ranked = sorted(self.scores, key=self.scores.get, reverse=True)
+        self.last_refresh = now
+
+    async def retract(self, collection: str, engagement: dict):
+        """Log a removed like or save for every worker's next refresh"""
+        await db.feed_retractions.insert_one({
+            "engagement_id": engagement["_id"],
+            "content_id": str(engagement["content_id"]),
+            "collection": collection,
+            "created_at": engagement["created_at"],
+            "removed_at": datetime.utcnow()
+        })
+
+    def remove(self, content_id: str):
+        if self.scores.pop(content_id, None) is not None:
+            self.ranked = [item for item in self.ranked if item != content_id]
+
+    async def prune(self, content_ids: List[str]):
+        """Drop ids deleted through another worker, confirmed on the primary"""
+        existing = {
+            str(content["_id"]) async for content in db.contents.find(
+                {"_id": {"$in": [ObjectId(content_id) for content_id in content_ids]}}, {"_id": 1}
+            )
+        }
+        for content_id in content_ids:
+            if content_id not in existing:
+                self.remove(content_id)
+
+    def page(self, skip: int, limit: int) -> List[str]:
+        return self.ranked[skip:skip + limit]
+
+feed_ranker = FeedRanker(FEED_HALF_LIFE_HOURS)
+
+# Search
+# In-process inverted index over content titles, descriptions and usernames.
+# It is updated directly by create/delete in this worker and catches up with
+# uploads from other workers on every refresh.
+SEARCH_FIELD_WEIGHTS = {"title": 3, "username": 2, "description": 1}
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_PATTERN.findall(text.casefold()) if text else []
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+        self.terms = []
+        self.cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS)
+        self.last_refresh = None
+
+    def add(self, content: dict):
+        content_id = str(content["_id"])
+        self.remove(content_id)
+
+        weights = {}
+        for field, weight in SEARCH_FIELD_WEIGHTS.items():
+            for term in tokenize(decompress_text(content.get(field))):
+                weights[term] = weights.get(term, 0) + weight
+
+        for term in weights:
+            if term not in self.postings:
+                self.postings[term] = set()
+                bisect.insort(self.terms, term)
+            self.postings[term].add(content_id)
+        self.documents[content_id] = (weights, content["created_at"])
+        self.cache.clear()
+
+    def remove(self, content_id: str):
+        document = self.documents.pop(content_id, None)
+        if document is None:
+            return
+
+        for term in document[0]:
+            postings = self.postings[term]
+            postings.discard(content_id)
+            if not postings:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+        self.cache.clear()
+
+    def expand(self, prefix: str, limit: int) -> List[str]:
+        start = bisect.bisect_left(self.terms, prefix)
+        matches = []
+        for term in self.terms[start:]:
+            if not term.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(term)
+        return matches
+
+    def search(self, query: str) -> List[str]:
+        """Return content ids matching every query term, the last one as a prefix"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        cache_key = ("search", tuple(tokens))
+        if cache_key in self.cache:
+            return self.cache[cache_key]
+
+        *exact, prefix = tokens
+        term_groups = [[term] for term in exact] + [self.expand(prefix, SEARCH_MAX_PREFIX_TERMS)]
+
+        matches = None
+        for group in term_groups:
+            group_matches = set()
+            for term in group:
+                group_matches |= self.postings.get(term, set())
+            matches = group_matches if matches is None else matches & group_matches
+            if not matches:
+                break
+
+        def score(content_id):
+            weights, created_at = self.documents[content_id]
+            relevance = sum(weights.get(term, 0) for group in term_groups for term in group)
+            # Whole-word matches rank above prefix-only ones
+            relevance += sum(weights.get(token, 0) for token in tokens)
+            return relevance, created_at
+
+        result = sorted(matches or [], key=score, reverse=True)
+        self.cache[cache_key] = result
+        return result
+
+    def suggest(self, prefix: str, limit: int) -> List[str]:
+        tokens = tokenize(prefix)
+        if not tokens:
+            return []
+        terms = self.expand(tokens[-1], SEARCH_MAX_PREFIX_TERMS)
+        terms.sort(key=lambda term: len(self.postings[term]), reverse=True)
+        return terms[:limit]
+
+    async def refresh(self):
+        now = datetime.utcnow()
+        window = {"$lte": now}
+        query = {"created_at": window}
+        if self.last_refresh:
+            window["$gt"] = self.last_refresh
+            # Uploads plus contents rewritten since, e.g. by a username change
+            query = {"$or": [{"created_at": window}, {"updated_at": window}]}
+
+        projection = {"title": 1, "description": 1, "username": 1, "created_at": 1}
+        async for content in db.contents.find(query, projection):
+            self.add(content)
+        self.last_refresh = now
+
+search_index = SearchIndex()
+
+# Trending leaderboards
+# Window name -> (span, bucket size)
+TRENDING_WINDOWS = {
+    "hour": (timedelta(hours=1), timedelta(minutes=5)),
+    "day": (timedelta(days=1), timedelta(hours=1)),
+    "week": (timedelta(days=7), timedelta(hours=6))
+}
+# Metric name -> source collection
+TRENDING_METRICS = {
+    "likes": "likes",
+    "comments": "comments",
+    "saves": "saved_contents"
+}
+EPOCH = datetime(1970, 1, 1)
+
+class SlidingCounter:
+    """Per-content counts over a sliding window of fixed-size time buckets"""
+
+    def __init__(self, span: timedelta, bucket: timedelta):
+        self.bucket_seconds = bucket.total_seconds()
+        self.size = int(span / bucket)
+        self.buckets = deque()
+        self.totals = {}
+        # Current top-k totals, kept up to date as counts grow; a decrement
+        # or expiry touching a leader marks it dirty for a full rebuild
+        self.top_totals = {}
+        self.floor = 0
+        self.top = None
+        self.dirty = False
+
+    def _index(self, at: datetime) -> int:
+        return int((at - EPOCH).total_seconds() // self.bucket_seconds)
+
+    def _expire(self, now: datetime):
+        oldest = self._index(now) - self.size
+        while self.buckets and self.buckets[0][0] <= oldest:
+            _, counts = self.buckets.popleft()
+            for content_id, count in counts.items():
+                self._add_total(content_id, -count)
+
+    def _add_total(self, content_id: str, delta: int):
+        remaining = self.totals.get(content_id, 0) + delta
+        if remaining > 0:
+            self.totals[content_id] = remaining
+        else:
+            self.totals.pop(content_id, None)
+
+        if delta > 0:
+            self._promote(content_id, remaining)
+        elif content_id in self.top_totals:
+            # Someone outside the top may now outrank it
+            self.dirty = True
+
+    def _promote(self, content_id: str, total: int):
+        if content_id in self.top_totals or len(self.top_totals) < TRENDING_TOP_K:
+            self.top_totals[content_id] = total
+        elif total > self.floor:
+            # floor is a lower bound on the smallest leader; confirm before evicting
+            smallest = min(self.top_totals, key=self.top_totals.get)
+            if total <= self.top_totals[smallest]:
+                self.floor = self.top_totals[smallest]
+                return
+            del self.top_totals[smallest]
+            self.top_totals[content_id] = total
+            self.floor = min(self.top_totals.values())
+        else:
+            return
+        self.top = None
+
+    def record(self, content_id: str, at: datetime, delta: int = 1):
+        index = self._index(at)
+        if index <= self._index(datetime.utcnow()) - self.size:
+            return
+
+        if delta < 0:
+            self._retract(content_id, -delta)
+            return
+
+        # Events almost always land in the newest bucket
+        counts = None
+        for bucket_index, bucket_counts in reversed(self.buckets):
+            if bucket_index == index:
+                counts = bucket_counts
+            if bucket_index <= index:
+                break
+        if counts is None:
+            counts = {}
+            bisect.insort(self.buckets, (index, counts), key=lambda bucket: bucket[0])
+
+        counts[content_id] = counts.get(content_id, 0) + delta
+        self._add_total(content_id, delta)
+
+    def _retract(self, content_id: str, amount: int):
+        """Take back counts from the newest buckets holding them.
+
+        Bucket counts never go negative, so an unlike for a like this worker
+        never counted is ignored instead of turning into a phantom count
+        when its bucket expires.
+        """
+        taken = 0
+        for _, counts in reversed(self.buckets):
+            if taken == amount:
+                break
+            count = counts.get(content_id, 0)
+            if not count:
+                continue
+            take = min(count, amount - taken)
+            if take == count:
+                del counts[content_id]
+            else:
+                counts[content_id] = count - take
+            taken += take
+        if taken:
+            self._add_total(content_id, -taken)
+
+    def remove(self, content_id: str):
+        for _, counts in self.buckets:
+            counts.pop(content_id, None)
+        self.totals.pop(content_id, None)
+        if content_id in self.top_totals:
+            self.dirty = True
+
+    def leaders(self, limit: int) -> list:
+        self._expire(datetime.utcnow())
+        if self.dirty:
+            self.top_totals = dict(heapq.nlargest(TRENDING_TOP_K, self.totals.items(), key=lambda item: item[1]))
+            self.floor = min(self.top_totals.values(), default=0)
+            self.top = None
+            self.dirty = False
+        if self.top is None:
+            self.top = sorted(self.top_totals.items(), key=lambda item: item[1], reverse=True)
+        return self.top[:limit]
+
+class Trending:
+    """Hourly, daily and weekly leaderboards for every engagement metric.
+
+    Handlers in this worker record events as they happen; resync() rebuilds
+    the counters from the database so workers converge on the same view.
+    """
+
+    def __init__(self):
+        self.counters = {
+            (metric, window): SlidingCounter(span, bucket)
+            for metric in TRENDING_METRICS
+            for window, (span, bucket) in TRENDING_WINDOWS.items()
+        }
+
+    def record(self, metric: str, content_id: str, at: datetime, delta: int = 1):
+        for window in TRENDING_WINDOWS:
+            self.counters[(metric, window)].record(content_id, at, delta)
+
+    def remove(self, content_id: str):
+        for counter in self.counters.values():
+            counter.remove(content_id)
+
+    def leaders(self, metric: str, window: str, limit: int) -> list:
+        return self.counters[(metric, window)].leaders(limit)
+
+    async def load(self):
+        # Group the last week of events into buckets of the finest window
+        since = datetime.utcnow() - max(span for span, _ in TRENDING_WINDOWS.values())
+        bucket_ms = min(bucket for _, bucket in TRENDING_WINDOWS.values()).total_seconds() * 1000
+        elapsed = {"$subtract": ["$created_at", EPOCH]}
+        for metric, collection in TRENDING_METRICS.items():
+            pipeline = [
+                {"$match": {"created_at": {"$gte": since}}},
+                {"$group": {
+                    "_id": {
+                        "content_id": "$content_id",
+                        "bucket": {"$subtract": [elapsed, {"$mod": [elapsed, bucket_ms]}]}
+                    },
+                    "count": {"$sum": 1}
+                }}
+            ]
+            async for item in db[collection].aggregate(pipeline):
+                at = EPOCH + timedelta(milliseconds=item["_id"]["bucket"])
+                self.record(metric, str(item["_id"]["content_id"]), at, item["count"])
+
+async def resync_trending():
+    global trending
+    fresh = Trending()
+    await fresh.load()
+    trending = fresh
+
+trending = Trending()
+
+# Creator profiles
+profile_cache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL_SECONDS)
+
+def invalidate_profile(user_id: str):
+    for key in [key for key in profile_cache if key[0] == user_id]:
+        profile_cache.pop(key, None)
+
+# Username changes
+# Contents and comments, archived ones included, carry a copy of their
+# author's username so reads need no join. A change is recorded in
+# db.username_jobs and rewritten in batches by whichever worker holds the
+# job's lease.
+USERNAME_COLLECTIONS = ("contents", "comments", "comments_archive")
+
+async def propagate_username(job_id: ObjectId):
+    now = datetime.utcnow()
+    job = await db.username_jobs.find_one_and_update(
+        {"_id": job_id, "status": {"$in": ["pending", "running"]}, "$or": [
+            {"lease_until": {"$lte": now}},
+            {"lease_until": {"$exists": False}}
+        ]},
+        {"$set": {"status": "running", "lease_until": now + timedelta(seconds=USERNAME_JOB_LEASE_SECONDS)}},
+        return_document=ReturnDocument.AFTER
+    )
+    if job is None:
+        return
     
-    # Check username uniqueness
-    existing_username = await db.users.find_one({"username": user_data.username})
-    if existing_username:
-        raise HTTPException(status_code=400, detail="Username already taken")
+    user_id, new_username = job["user_id"], job["new_username"]
+    stale = {"user_id": fk_match(user_id), "username": {"$ne": new_username}}
+    if not job.get("totals"):
+        totals = {collection: await db[collection].count_documents(stale) for collection in USERNAME_COLLECTIONS}
+        await db.username_jobs.update_one({"_id": job_id}, {"$set": {"totals": totals}})
+    
+    for collection in USERNAME_COLLECTIONS:
+        while True:
+            # A later change owns the rest; stop so we don't write an older name back
+            user = await db.users.find_one({"_id": ObjectId(user_id)}, {"username": 1})
+            if not user or user["username"] != new_username:
+                await db.username_jobs.update_one(
+                    {"_id": job_id},
+                    {"$set": {"status": "superseded", "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+                )
+                return
+            
+            batch = await db[collection].find(stale, {"_id": 1}).limit(USERNAME_FANOUT_BATCH_SIZE).to_list(USERNAME_FANOUT_BATCH_SIZE)
+            if not batch:
+                break
+            now = datetime.utcnow()
+            result = await db[collection].update_many(
+                {"_id": {"$in": [document["_id"] for document in batch]}, "username": {"$ne": new_username}},
+                {"$set": {"username": new_username, "updated_at": now}}
+            )
+            await db.username_jobs.update_one({"_id": job_id}, {
+                "$inc": {f"progress.{collection}": result.modified_count},
+                "$set": {"updated_at": now, "lease_until": now + timedelta(seconds=USERNAME_JOB_LEASE_SECONDS)}
+            })
+            await asyncio.sleep(USERNAME_FANOUT_PAUSE_SECONDS)
     
+    now = datetime.utcnow()
+    await db.username_jobs.update_one(
+        {"_id": job_id},
+        {"$set": {"status": "done", "finished_at": now, "updated_at": now, "lease_until": now}}
+    )
+    invalidate_profile(user_id)
+    await search_index.refresh()
+
+async def resume_username_jobs():
+    """Pick up jobs whose worker died or whose first run failed"""
+    now = datetime.utcnow()
+    async for job in db.username_jobs.find(
+        {"status": {"$in": ["pending", "running"]}, "lease_until": {"$lte": now}}, {"_id": 1}
+    ):
+        try:
+            await propagate_username(job["_id"])
+        except Exception:
+            logger.exception("Username job %s failed", job["_id"])
+
+# Playback events
+# Events are buffered in memory and written with insert_many, each stamped
+# with the EVENTS_BUCKET_SECONDS bucket it was flushed in. A rollup job folds
+# closed buckets into per-content counters.
+EVENT_COUNTERS = {
+    "play": "plays_count",
+    "seek": None,
+    "complete": "completions_count"
+}
+
+def event_bucket(at: datetime) -> datetime:
+    elapsed = int((at - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=elapsed - elapsed % EVENTS_BUCKET_SECONDS)
+
+class EventBuffer:
+    def __init__(self):
+        self.events = []
+        self.dropped = 0
+
+    def _keep(self, events: list):
+        # Drop what does not fit rather than growing without bound
+        room = max(EVENTS_MAX_BUFFER - len(self.events), 0)
+        self.dropped += max(len(events) - room, 0)
+        self.events.extend(events[:room])
+
+    def add(self, events: list):
+        self._keep(events)
+        if len(self.events) >= EVENTS_FLUSH_SIZE:
+            spawn(self.flush())
+
+    async def flush(self):
+        if not self.events:
+            return
+        events, self.events = self.events, []
+        # Bucket by flush time: a batch held back by a failed flush must not
+        # land in a bucket the rollup has already passed
+        bucket = event_bucket(datetime.utcnow())
+        for event in events:
+            event["bucket"] = bucket
+        try:
+            # insert_many assigns each event an _id, so a retried event that
+            # was already written fails with a duplicate key instead of twice
+            await db.events.insert_many(events, ordered=False)
+        except BulkWriteError as e:
+            failed = [error["index"] for error in e.details["writeErrors"] if error["code"] != 11000]
+            if failed:
+                logger.error("Failed to write %d playback events", len(failed))
+                self._keep([events[index] for index in failed])
+        except asyncio.CancelledError:
+            # Shutdown cancelled the periodic flush; the final flush writes this batch
+            self._keep(events)
+            raise
+        except Exception:
+            # Keep the batch for the next flush as long as there is room
+            logger.exception("Failed to flush %d playback events", len(events))
+            self._keep(events)
+
+event_buffer = EventBuffer()
+
+async def acquire_lease(name: str, seconds: float) -> Optional[dict]:
+    """Claim a db.rollups job document so only one worker runs the job; None if held elsewhere"""
+    now = datetime.utcnow()
+    try:
+        return await db.rollups.find_one_and_update(
+            {"_id": name, "$or": [
+                {"lease_until": {"$lte": now}},
+                {"lease_until": {"$exists": False}}
+            ]},
+            {"$set": {"lease_until": now + timedelta(seconds=seconds)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return None
+
+async def roll_up_events():
+    now = datetime.utcnow()
+    
+    # Only one worker rolls up at a time
+    state = await acquire_lease("events", EVENTS_ROLLUP_SECONDS)
+    if state is None:
+        return
+    lease_until = state["lease_until"]
+    
+    # Leave time for other workers' buffers to flush into open buckets
+    rolled_through = state.get("rolled_through", EPOCH)
+    until = event_bucket(now - timedelta(seconds=EVENTS_FLUSH_SECONDS * 2))
+    increments = {}
+    if until > rolled_through:
+        pipeline = [
+            {"$match": {
+                "bucket": {"$gte": rolled_through, "$lt": until},
+                "type": {"$in": [event_type for event_type, field in EVENT_COUNTERS.items() if field]}
+            }},
+            {"$group": {"_id": {"bucket": "$bucket", "content_id": "$content_id", "type": "$type"}, "count": {"$sum": 1}}}
+        ]
+        async for item in db.events.aggregate(pipeline):
+            field = EVENT_COUNTERS[item["_id"]["type"]]
+            counters = increments.setdefault(item["_id"]["bucket"], {}).setdefault(item["_id"]["content_id"], {})
+            counters[field] = item["count"]
+    
+    # Oldest bucket first. Each content records the last bucket folded into
+    # it in the same write as the increment, so a rollup retried after a
+    # crash or a lost lease skips what it already applied.
+    for bucket in sorted(increments):
+        await db.contents.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(content_id), "$or": [
+                    {"events_rolled_through": {"$lt": bucket}},
+                    {"events_rolled_through": {"$exists": False}}
+                ]},
+                {"$inc": counters, "$set": {"events_rolled_through": bucket}}
+            )
+            for content_id, counters in increments[bucket].items()
+        ], ordered=False)
+        
+        # Checkpoint and renew, unless another worker took the lease over
+        state = await db.rollups.find_one_and_update(
+            {"_id": "events", "lease_until": lease_until},
+            {"$set": {
+                "rolled_through": bucket + timedelta(seconds=EVENTS_BUCKET_SECONDS),
+                "lease_until": datetime.utcnow() + timedelta(seconds=EVENTS_ROLLUP_SECONDS)
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        if state is None:
+            logger.warning("Lost the events rollup lease at bucket %s", bucket)
+            return
+        lease_until = state["lease_until"]
+    
+    await db.rollups.update_one(
+        {"_id": "events", "lease_until": lease_until},
+        {"$set": {"rolled_through": max(until, rolled_through), "lease_until": datetime.utcnow()}}
+    )
+
+# Engagement archival
+# Hot collections moved to <name>_archive past the horizon. Archiving never
+# touches contents counters, which keep counting archived rows.
+ARCHIVED_ENGAGEMENT = ("likes", "saved_contents", "comments")
+
+def archive_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(days=ARCHIVE_HORIZON_DAYS)
+
+def may_be_archived(content: dict) -> bool:
+    # Nothing about content younger than the horizon can have been archived
+    return content["created_at"] < archive_cutoff()
+
+def by_id_and_shard_key(collection: str, document: dict) -> dict:
+    """Filter for one document that a sharded cluster can route to a single shard"""
+    return {"_id": document["_id"], **{field: document[field] for field in SHARD_KEYS[collection]}}
+
+async def remove_archived(collection: str, document: dict):
+    await db[f"{collection}_archive"].delete_one(by_id_and_shard_key(f"{collection}_archive", document))
+
+async def find_engagement(collection: str, content: dict, user_id: str) -> tuple:
+    """A user's like or save of content, from the hot collection or the archive"""
+    query = {"content_id": fk_match(str(content["_id"])), "user_id": fk_match(user_id)}
+    document = await db[collection].find_one(query)
+    if document is None and may_be_archived(content):
+        document = await db[f"{collection}_archive"].find_one(query)
+        return document, document is not None
+    return document, False
+
+async def newest_with_archive(source, collection: str, query: dict, skip: int, limit: int) -> list:
+    """Newest-first page that continues into the archive once the hot collection runs out"""
+    items = await source[collection].find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+    if len(items) >= limit:
+        return items
+    
+    hot_total = skip + len(items) if items else await source[collection].count_documents(query)
+    archived = await source[f"{collection}_archive"].find(query).skip(max(skip - hot_total, 0)).limit(
+        limit - len(items)
+    ).sort("created_at", -1).to_list(limit - len(items))
+    return items + archived
+
+async def archive_collection(collection: str, cutoff: datetime) -> int:
+    archive = db[f"{collection}_archive"]
+    moved = 0
+    while True:
+        batch = await db[collection].find({"created_at": {"$lt": cutoff}}, {field: 1 for field in SHARD_KEYS[collection]}).sort(
+            "created_at", 1
+        ).limit(ARCHIVE_BATCH_SIZE).to_list(ARCHIVE_BATCH_SIZE)
+        if not batch:
+            return moved
+        
+        # Take each row out of the hot collection first and archive only what
+        # was removed, so an unlike or unsave racing the move can't be undone
+        removed = []
+        for document in batch:
+            document = await db[collection].find_one_and_delete(by_id_and_shard_key(collection, document))
+            if document is not None:
+                removed.append(document)
+        if removed:
+            await archive.insert_many(removed, ordered=False)
+        moved += len(removed)
+        await asyncio.sleep(ARCHIVE_BATCH_PAUSE_SECONDS)
+
+async def archive_engagement():
+    if await acquire_lease("archive", ARCHIVE_INTERVAL_SECONDS) is None:
+        return
+    
+    cutoff = archive_cutoff()
+    for collection in ARCHIVED_ENGAGEMENT:
+        moved = await archive_collection(collection, cutoff)
+        if moved:
+            logger.info("Archived %d %s older than %s", moved, collection, cutoff)
+    
+    await db.rollups.update_one({"_id": "archive"}, {"$set": {"archived_through": cutoff, "lease_until": datetime.utcnow()}})
+
+# Rate limiting
+# Rule name -> (burst capacity, seconds to refill it). Override with
+# RATE_LIMITS="login=10/60,upload=5/3600".
+RATE_LIMIT_RULES = {
+    "login": (10, 60),
+    "register": (5, 300),
+    "like": (120, 60),
+    "comment": (30, 60),
+    "upload": (10, 3600),
+    "username": (3, 86400)
+}
+for rule in filter(None, os.environ.get("RATE_LIMITS", "").split(",")):
+    name, _, limit = rule.partition("=")
+    capacity, _, period = limit.partition("/")
+    RATE_LIMIT_RULES[name.strip()] = (int(capacity), float(period))
+
+rate_limit_rejections = Counter()
+
+class MemoryRateLimiter:
+    """Token buckets kept in this worker"""
+
+    def __init__(self):
+        longest = max(period for _, period in RATE_LIMIT_RULES.values())
+        # An idle bucket refills completely within its period, so it can be forgotten
+        self.buckets = TTLCache(maxsize=RATE_LIMIT_MAX_KEYS, ttl=longest)
+
+    async def acquire(self, key: str, capacity: int, period: float) -> float:
+        """Take a token and return 0, or the seconds until one is available"""
+        rate = capacity / period
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens < 1:
+            self.buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+        self.buckets[key] = (tokens - 1, now)
+        return 0
+
+class MongoRateLimiter:
+    """Token buckets shared by all workers in db.rate_limits"""
+
+    async def acquire(self, key: str, capacity: int, period: float) -> float:
+        rate = capacity / period
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        bucket = await db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [capacity, {"$add": [
+                        {"$ifNull": ["$tokens", capacity]},
+                        {"$multiply": [elapsed, rate]}
+                    ]}]},
+                    "updated_at": "$$NOW",
+                    "expires_at": {"$add": ["$$NOW", int(period * 1000)]}
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if bucket["allowed"]:
+            return 0
+        return (1 - bucket["tokens"]) / rate
+
+rate_limiter = MongoRateLimiter() if RATE_LIMIT_BACKEND == "mongo" else MemoryRateLimiter()
+
+def client_ip(request: Request) -> str:
+    # uvicorn resolves X-Forwarded-For into request.client, but only for
+    # peers listed in FORWARDED_ALLOW_IPS (see run.py), so clients can't
+    # pick a fresh bucket by forging the header
+    return request.client.host if request.client else "unknown"
+
+class RateLimit:
+    """Route dependency enforcing a rate limit rule per client IP or per user"""
+
+    def __init__(self, rule: str, per: str = "ip"):
+        self.rule = rule
+        self.per = per
+
+    def identity(self, request: Request) -> str:
+        if self.per == "user":
+            scheme, _, token = request.headers.get("authorization", "").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    return "user:" + jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])["sub"]
+                except (jwt.PyJWTError, KeyError):
+                    pass
+        return "ip:" + client_ip(request)
+
+    async def __call__(self, request: Request):
+        capacity, period = RATE_LIMIT_RULES[self.rule]
+        retry_after = await rate_limiter.acquire(f"{self.rule}:{self.identity(request)}", capacity, period)
+        if retry_after:
+            rate_limit_rejections[self.rule] += 1
+            RATE_LIMIT_REJECTIONS.labels(self.rule).inc()
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+# Health checks
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a periodic timer"""
+
+    def __init__(self):
+        self.last_sample = None
+        # Worst lag over the last few seconds, so a single stall is not missed
+        self.samples = deque(maxlen=10)
+
+    @property
+    def lag_ms(self) -> float:
+        return max(self.samples, default=0.0)
+
+    async def sample(self):
+        now = time.monotonic()
+        if self.last_sample is not None:
+            self.samples.append(max(0.0, now - self.last_sample - LOOP_LAG_INTERVAL_SECONDS) * 1000)
+        self.last_sample = now
+
+loop_lag = LoopLagMonitor()
+
+class ReadinessProbe:
+    """Dependency checks, cached so frequent probes stay cheap"""
+
+    def __init__(self):
+        self.result = None
+        self.expires = 0.0
+        self.lock = asyncio.Lock()
+
+    async def check(self) -> dict:
+        async with self.lock:
+            if self.result is None or time.monotonic() >= self.expires:
+                self.result = await self._run()
+                self.expires = time.monotonic() + HEALTH_CACHE_SECONDS
+            return self.result
+
+    async def _run(self) -> dict:
+        mongo = {"status": "up"}
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(client.admin.command("ping"), HEALTH_PING_TIMEOUT_SECONDS)
+        except Exception as e:
+            mongo = {"status": "down", "error": type(e).__name__}
+        mongo["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        max_pool_size = client.options.pool_options.max_pool_size
+        in_use = max(pool_usage.checked_out.values(), default=0)
+        mongo["pool"] = {
+            "in_use": in_use,
+            "max_size": max_pool_size,
+            "saturation": round(in_use / max_pool_size, 3) if max_pool_size else 0.0
+        }
+
+        checks = {
+            "mongo": mongo["status"] == "up",
+            "pool": mongo["pool"]["saturation"] < HEALTH_MAX_POOL_SATURATION,
+            "event_loop": loop_lag.lag_ms < HEALTH_MAX_LOOP_LAG_MS
+        }
+        return {
+            "status": "ready" if all(checks.values()) else "unready",
+            "checks": checks,
+            "mongo": mongo,
+            "event_loop_lag_ms": round(loop_lag.lag_ms, 2),
+            "checked_at": datetime.utcnow()
+        }
+
+readiness_probe = ReadinessProbe()
+
+# Read routing
+# The client carries proof of its last write, a short-lived signed token in
+# a cookie (or echoed back in X-Last-Write), so every worker routes its
+# reads to the primary until secondaries have caught up.
+def mark_write(response: Response, user_id: str):
+    expires = datetime.utcnow() + timedelta(seconds=READ_YOUR_WRITES_SECONDS)
+    token = jwt.encode({"sub": user_id, "type": "last_write", "exp": expires}, SECRET_KEY, algorithm=ALGORITHM)
+    response.set_cookie(LAST_WRITE_COOKIE, token, max_age=int(READ_YOUR_WRITES_SECONDS), httponly=True, samesite="lax")
+    response.headers[LAST_WRITE_HEADER] = token
+
+def get_read_source(request: Request):
+    """Primary for a client inside its read-your-writes window, read_db otherwise"""
+    token = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    if token:
+        try:
+            if jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("type") == "last_write":
+                return db
+        except jwt.PyJWTError:
+            pass
+    return read_db
+
+# Background jobs
+background_tasks = []
+running_jobs = set()
+
+def spawn(coro):
+    """Run a one-off job without blocking the request that triggered it"""
+    # Start from an empty context so the job doesn't inherit the request's
+    # database deadline
+    task = Context().run(asyncio.create_task, coro)
+    running_jobs.add(task)
+    task.add_done_callback(running_jobs.discard)
+    return task
+
+def run_periodic(interval: float, job):
+    async def loop():
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await job()
+            except Exception:
+                logger.exception("Periodic job %s failed", job.__qualname__)
+
+    background_tasks.append(asyncio.create_task(loop()))
+
+# Following timelines
+# Each user has a db.timelines document holding the newest TIMELINE_MAX_ITEMS
+# entries pushed by creators they follow. Creators with more than
+# FANOUT_MAX_FOLLOWERS followers are not fanned out; their uploads are merged
+# in at read time instead.
+def timeline_push(entries: list) -> dict:
+    return {
+        "$push": {
+            "items": {
+                "$each": entries,
+                "$sort": {"created_at": -1},
+                "$slice": TIMELINE_MAX_ITEMS
+            }
+        }
+    }
+
+def timeline_entry(content: dict) -> dict:
+    return {
+        "content_id": str(content["_id"]),
+        "creator_id": str(content["user_id"]),
+        "created_at": content["created_at"]
+    }
+
+async def fan_out_content(content: dict):
+    push = timeline_push([timeline_entry(content)])
+    batch = []
+    async for follow in db.follows.find({"followee_id": str(content["user_id"])}, {"follower_id": 1}):
+        batch.append(UpdateOne({"_id": follow["follower_id"]}, push, upsert=True))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            await db.timelines.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.timelines.bulk_write(batch, ordered=False)
+
+class LargeCreators:
+    """Cached ids of creators whose uploads are pulled at read time"""
+
+    def __init__(self):
+        self.ids = set()
+
+    async def refresh(self):
+        users = await db.users.find(
+            {"followers_count": {"$gt": FANOUT_MAX_FOLLOWERS}},
+            {"_id": 1}
+        ).to_list(None)
+        self.ids = {str(user["_id"]) for user in users}
+
+large_creators = LargeCreators()
+
+# Auth Routes
+@api_router.post("/auth/register", response_model=Token, dependencies=[Depends(RateLimit("register"))])
+async def register(user_data: UserCreate):
     # Hash password
     hashed_password = hash_password(user_data.password)
     
@@ -255,22 +1880,20 @@ async def register(user_data: UserCreate):
         "created_at": datetime.utcnow()
     }
     
-    result = await db.users.insert_one(user_dict)
-    user_id = str(result.inserted_id)
-    
-    # Create access token
-    access_token = create_access_token(data={"sub": user_id})
+    # Email and username uniqueness is enforced by unique indexes
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError as e:
+        if duplicate_key_field(e) == "username":
+            raise HTTPException(status_code=400, detail="Username already taken")
+        raise HTTPException(status_code=400, detail="User already exists")
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Create access and refresh tokens
+    return await issue_tokens(user_dict)
 
 @api_router.post("/auth/create-admin")
 async def create_admin_account():
     """Special endpoint to create the admin account"""
-    # Check if admin already exists
-    existing_admin = await db.users.find_one({"email": "fabio@drezzle.com"})
-    if existing_admin:
-        return {"message": "Admin account already exists"}
-    
     # Create admin account
     hashed_password = hash_password("1234")
     
@@ -285,17 +1908,39 @@ async def create_admin_account():
         "created_at": datetime.utcnow()
     }
     
-    result = await db.users.insert_one(admin_dict)
+    try:
+        result = await db.users.insert_one(admin_dict)
+    except DuplicateKeyError:
+        return {"message": "Admin account already exists"}
     return {"message": "Admin account created successfully", "admin_id": str(result.inserted_id)}
 
-@api_router.post("/auth/login", response_model=Token)
+@api_router.post("/auth/login", response_model=Token, dependencies=[Depends(RateLimit("login"))])
 async def login(user_data: UserLogin):
     user = await db.users.find_one({"email": user_data.email})
     if not user or not verify_password(user_data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    access_token = create_access_token(data={"sub": str(user["_id"])})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return await issue_tokens(user)
+
+@api_router.post("/auth/refresh", response_model=Token)
+async def refresh_access_token(request_data: RefreshRequest):
+    try:
+        payload = jwt.decode(request_data.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if payload.get("type") != "refresh":
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    # Refresh tokens are single use and rotated on every refresh
+    stored = await db.refresh_tokens.find_one_and_delete({"_id": payload.get("jti")})
+    if not stored:
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
+    
+    user = await db.users.find_one({"_id": ObjectId(stored["user_id"])})
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    
+    return await issue_tokens(user)
 
 @api_router.get("/auth/me", response_model=User)
 async def get_me(current_user: User = Depends(get_current_user)):
@@ -303,75 +1948,80 @@ async def get_me(current_user: User = Depends(get_current_user)):
 
 # Expert Verification Routes
 @api_router.post("/auth/verify-expert")
-async def submit_expert_verification(verification: VerificationRequest, current_user: User = Depends(get_current_user)):
+async def submit_expert_verification(verification: VerificationRequest, current_user: Principal = Depends(get_current_principal)):
     if current_user.role != "expert":
         raise HTTPException(status_code=403, detail="Only expert applicants can submit verification")
     
+    documents_blob = await store_blob(verification.documents, compress=True)
+
     # Update user with verification documents
-    await db.users.update_one(
+    previous = await db.users.find_one_and_update(
         {"_id": ObjectId(current_user.id)},
         {
             "$set": {
-                "verification_documents": verification.documents,
-                "verification_description": verification.description,
+                "verification_documents_blob": documents_blob,
+                "verification_description": compress_text(verification.description),
                 "badge_status": "pending"
-            }
-        }
+            },
+            "$unset": {"verification_documents": ""}
+        },
+        projection={"verification_documents_blob": 1}
     )
-    
+
+    # Release the previously submitted documents
+    if previous:
+        await release_blob(previous.get("verification_documents_blob"))
+
     return {"message": "Verification documents submitted successfully"}
 
 # Content Save/Unsave Routes
 @api_router.post("/contents/{content_id}/save")
-async def save_content(content_id: str, current_user: User = Depends(get_current_user)):
+async def save_content(content_id: str, response: Response, current_user: Principal = Depends(get_current_principal)):
     # Check if content exists
     content = await db.contents.find_one({"_id": ObjectId(content_id)})
     if not content:
         raise HTTPException(status_code=404, detail="Content not found")
     
     # Check if already saved
-    existing_save = await db.saved_contents.find_one({"content_id": content_id, "user_id": current_user.id})
+    existing_save, archived = await find_engagement("saved_contents", content, current_user.id)
     if existing_save:
         # Unsave
-        await db.saved_contents.delete_one({"content_id": content_id, "user_id": current_user.id})
+        if archived:
+            await remove_archived("saved_contents", existing_save)
+        else:
+            await db.saved_contents.delete_one(by_id_and_shard_key("saved_contents", existing_save))
+        mark_write(response, current_user.id)
+        trending.record("saves", content_id, existing_save["created_at"], -1)
+        await feed_ranker.retract("saved_contents", existing_save)
         return {"message": "Content unsaved", "saved": False}
     else:
         # Save
-        await db.saved_contents.insert_one({
-            "content_id": content_id,
-            "user_id": current_user.id,
-            "created_at": datetime.utcnow()
-        })
+        saved_at = datetime.utcnow()
+        try:
+            await db.saved_contents.insert_one({
+                "content_id": fk_value(content_id),
+                "user_id": fk_value(current_user.id),
+                "created_at": saved_at
+            })
+        except DuplicateKeyError:
+            # A concurrent request saved it first
+            return {"message": "Content saved", "saved": True}
+        mark_write(response, current_user.id)
+        trending.record("saves", content_id, saved_at)
         return {"message": "Content saved", "saved": True}
 
 @api_router.get("/saved-contents")
-async def get_saved_contents(current_user: User = Depends(get_current_user), skip: int = 0, limit: int = 20):
-    saved_items = await db.saved_contents.find({"user_id": current_user.id}).skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+async def get_saved_contents(current_user: Principal = Depends(get_current_principal), skip: int = 0, limit: int = 20, source=Depends(get_read_source)):
+    saved_items = await newest_with_archive(source, "saved_contents", {"user_id": fk_match(current_user.id)}, skip, limit)
     
-    result = []
-    for saved_item in saved_items:
-        content = await db.contents.find_one({"_id": ObjectId(saved_item["content_id"])})
-        if content:
-            result.append(Content(
-                id=str(content["_id"]),
-                user_id=content["user_id"],
-                title=content["title"],
-                description=content.get("description"),
-                content_type=content.get("content_type", "audio"),
-                audio_data=content.get("audio_data"),
-                video_data=content.get("video_data"),
-                cover_image=content.get("cover_image"),
-                duration=content.get("duration"),
-                likes_count=content.get("likes_count", 0),
-                comments_count=content.get("comments_count", 0),
-                created_at=content["created_at"]
-            ))
+    contents = await load_contents([str(saved_item["content_id"]) for saved_item in saved_items], source)
     
-    return result
+    await attach_media(contents)
+    return [build_content(content) for content in contents]
 
 # Content Routes
-@api_router.post("/contents", response_model=Content)
-async def create_content(content_data: ContentCreate, current_user: User = Depends(get_current_user)):
+@api_router.post("/contents", response_model=Content, dependencies=[Depends(RateLimit("upload", per="user"))])
+async def create_content(content_data: ContentCreate, response: Response, current_user: Principal = Depends(get_current_principal)):
     # Check if user can upload based on verified role
     if current_user.verified_role not in ["creator"]:
         raise HTTPException(status_code=403, detail="Only verified creators can upload content")
@@ -382,16 +2032,21 @@ async def create_content(content_data: ContentCreate, current_user: User = Depen
     elif content_data.content_type == "video" and not content_data.video_data:
         raise HTTPException(status_code=400, detail="Video data is required for video content")
     
+    # Store media by hash so reposts reference the existing copy
+    media_refs = {}
+    for field in MEDIA_FIELDS:
+        blob_id = await store_blob(getattr(content_data, field))
+        if blob_id:
+            media_refs[field] = blob_id
+    
     content_dict = {
-        "user_id": current_user.id,
+        "user_id": fk_value(current_user.id),
         "username": current_user.username,
         "user_role": current_user.verified_role,
         "title": content_data.title,
-        "description": content_data.description,
+        "description": compress_text(content_data.description),
         "content_type": content_data.content_type,
-        "audio_data": content_data.audio_data,
-        "video_data": content_data.video_data,
-        "cover_image": content_data.cover_image,
+        "media_refs": media_refs,
         "duration": content_data.duration,
         "likes_count": 0,
         "comments_count": 0,
@@ -401,6 +2056,16 @@ async def create_content(content_data: ContentCreate, current_user: User = Depen
     result = await db.contents.insert_one(content_dict)
     content_id = str(result.inserted_id)
     
+    content_dict["_id"] = result.inserted_id
+    mark_write(response, current_user.id)
+    search_index.add(content_dict)
+    invalidate_profile(current_user.id)
+    
+    # Push to followers' timelines unless followers read this creator on demand
+    creator = await db.users.find_one({"_id": ObjectId(current_user.id)}, {"followers_count": 1})
+    if creator and 0 < creator.get("followers_count", 0) <= FANOUT_MAX_FOLLOWERS:
+        spawn(fan_out_content(content_dict))
+    
     return Content(
         id=content_id,
         user_id=current_user.id,
@@ -417,70 +2082,83 @@ async def create_content(content_data: ContentCreate, current_user: User = Depen
     )
 
 @api_router.get("/contents", response_model=List[Content])
-async def get_contents(skip: int = 0, limit: int = 20):
-    contents = await db.contents.find().skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+async def get_contents(request: Request, response: Response, skip: int = 0, limit: int = 20, sort: str = "recent", source=Depends(get_read_source)):
+    if sort == "ranked":
+        # Ranked page comes from the precomputed index
+        content_ids = feed_ranker.page(skip, limit)
+        contents = await load_contents(content_ids, source)
+        if len(contents) < len(content_ids):
+            await feed_ranker.prune(content_ids)
+    elif sort == "recent":
+        contents = await source.contents.find().skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+    else:
+        raise HTTPException(status_code=400, detail="Unknown sort order")
     
-    result = []
-    for content in contents:
-        result.append(Content(
-            id=str(content["_id"]),
-            user_id=content["user_id"],
-            title=content["title"],
-            description=content.get("description"),
-            content_type=content.get("content_type", "audio"),
-            audio_data=content.get("audio_data"),
-            video_data=content.get("video_data"),
-            cover_image=content.get("cover_image"),
-            duration=content.get("duration"),
-            likes_count=content.get("likes_count", 0),
-            comments_count=content.get("comments_count", 0),
-            created_at=content["created_at"]
-        ))
+    # Unchanged page: skip loading media and serializing
+    etag = content_etag(contents, sort, skip, limit)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
     
-    return result
+    await attach_media(contents)
+    return [build_content(content) for content in contents]
 
-@api_router.post("/contents/{content_id}/like")
-async def like_content(content_id: str, current_user: User = Depends(get_current_user)):
+@api_router.post("/contents/{content_id}/like", dependencies=[Depends(RateLimit("like", per="user"))])
+async def like_content(content_id: str, response: Response, current_user: Principal = Depends(get_current_principal)):
     # Check if content exists
     content = await db.contents.find_one({"_id": ObjectId(content_id)})
     if not content:
         raise HTTPException(status_code=404, detail="Content not found")
     
-    # Check if already liked
-    existing_like = await db.likes.find_one({"content_id": content_id, "user_id": current_user.id})
+    # Check if already liked, including likes archived with old content
+    existing_like, archived = await find_engagement("likes", content, current_user.id)
     if existing_like:
         # Unlike
-        await db.likes.delete_one({"content_id": content_id, "user_id": current_user.id})
+        if archived:
+            await remove_archived("likes", existing_like)
+        else:
+            await db.likes.delete_one(by_id_and_shard_key("likes", existing_like))
         await db.contents.update_one(
             {"_id": ObjectId(content_id)},
             {"$inc": {"likes_count": -1}}
         )
+        mark_write(response, current_user.id)
+        trending.record("likes", content_id, existing_like["created_at"], -1)
+        await feed_ranker.retract("likes", existing_like)
         return {"message": "Content unliked", "liked": False}
     else:
         # Like
-        await db.likes.insert_one({
-            "content_id": content_id,
-            "user_id": current_user.id,
-            "created_at": datetime.utcnow()
-        })
+        liked_at = datetime.utcnow()
+        try:
+            await db.likes.insert_one({
+                "content_id": fk_value(content_id),
+                "user_id": fk_value(current_user.id),
+                "created_at": liked_at
+            })
+        except DuplicateKeyError:
+            # A concurrent request liked it first and counted it
+            return {"message": "Content liked", "liked": True}
         await db.contents.update_one(
             {"_id": ObjectId(content_id)},
             {"$inc": {"likes_count": 1}}
         )
+        mark_write(response, current_user.id)
+        trending.record("likes", content_id, liked_at)
         return {"message": "Content liked", "liked": True}
 
-@api_router.post("/contents/{content_id}/comments", response_model=Comment)
-async def create_comment(content_id: str, comment_data: CommentCreate, current_user: User = Depends(get_current_user)):
+@api_router.post("/contents/{content_id}/comments", response_model=Comment, dependencies=[Depends(RateLimit("comment", per="user"))])
+async def create_comment(content_id: str, comment_data: CommentCreate, response: Response, current_user: Principal = Depends(get_current_principal)):
     # Check if content exists
     content = await db.contents.find_one({"_id": ObjectId(content_id)})
     if not content:
         raise HTTPException(status_code=404, detail="Content not found")
     
     comment_dict = {
-        "content_id": content_id,
-        "user_id": current_user.id,
+        "content_id": fk_value(content_id),
+        "user_id": fk_value(current_user.id),
         "username": current_user.username,
-        "text": comment_data.text,
+        "text": compress_text(comment_data.text),
         "created_at": datetime.utcnow()
     }
     
@@ -491,6 +2169,8 @@ async def create_comment(content_id: str, comment_data: CommentCreate, current_u
         {"_id": ObjectId(content_id)},
         {"$inc": {"comments_count": 1}}
     )
+    mark_write(response, current_user.id)
+    trending.record("comments", content_id, comment_dict["created_at"])
     
     return Comment(
         id=str(result.inserted_id),
@@ -502,25 +2182,285 @@ async def create_comment(content_id: str, comment_data: CommentCreate, current_u
     )
 
 @api_router.get("/contents/{content_id}/comments", response_model=List[Comment])
-async def get_comments(content_id: str, skip: int = 0, limit: int = 20):
-    comments = await db.comments.find({"content_id": content_id}).skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+async def get_comments(request: Request, response: Response, content_id: str, skip: int = 0, limit: int = 20, source=Depends(get_read_source)):
+    comments = await newest_with_archive(source, "comments", {"content_id": fk_match(content_id)}, skip, limit)
+    
+    # Only the author's username changes after posting, on a rename
+    etag = weak_etag(content_id, skip, limit, [(str(comment["_id"]), comment["username"]) for comment in comments])
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
     
     result = []
     for comment in comments:
         result.append(Comment(
             id=str(comment["_id"]),
-            content_id=comment["content_id"],
-            user_id=comment["user_id"],
+            content_id=str(comment["content_id"]),
+            user_id=str(comment["user_id"]),
             username=comment["username"],
-            text=comment["text"],
+            text=decompress_text(comment["text"]),
             created_at=comment["created_at"]
         ))
     
     return result
 
+# Search Routes
+@api_router.get("/search", response_model=List[Content])
+async def search_contents(q: str, skip: int = 0, limit: int = 20):
+    contents = await load_contents(search_index.search(q)[skip:skip + limit])
+    
+    await attach_media(contents)
+    return [build_content(content) for content in contents]
+
+@api_router.get("/search/autocomplete")
+async def autocomplete(q: str, limit: int = 10):
+    return {"query": q, "suggestions": search_index.suggest(q, limit)}
+
+# Event Routes
+@api_router.post("/events", status_code=status.HTTP_202_ACCEPTED)
+async def track_events(batch: PlaybackEventBatch, current_user: Principal = Depends(get_current_principal)):
+    if len(batch.events) > EVENTS_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {EVENTS_MAX_BATCH} events per batch")
+    
+    now = datetime.utcnow()
+    events = [
+        {
+            "content_id": event.content_id,
+            "user_id": current_user.id,
+            "type": event.type,
+            "position": event.position,
+            "occurred_at": event.timestamp or now,
+            "created_at": now
+        }
+        for event in batch.events
+        if event.type in EVENT_COUNTERS and ObjectId.is_valid(event.content_id)
+    ]
+    event_buffer.add(events)
+    
+    return {"accepted": len(events), "rejected": len(batch.events) - len(events)}
+
+# Profile Routes
+async def load_profile(user_id: str, skip: int, limit: int) -> tuple:
+    # Page of uploads and totals in a single aggregation
+    pipeline = [
+        {"$match": {"user_id": fk_match(user_id)}},
+        {"$facet": {
+            "contents": [
+                {"$sort": {"created_at": -1}},
+                {"$skip": skip},
+                {"$limit": limit}
+            ],
+            "totals": [
+                {"$group": {
+                    "_id": None,
+                    "uploads": {"$sum": 1},
+                    "likes": {"$sum": "$likes_count"},
+                    "comments": {"$sum": "$comments_count"}
+                }}
+            ]
+        }}
+    ]
+    user, facets = await asyncio.gather(
+        db.users.find_one(
+            {"_id": ObjectId(user_id)},
+            {"username": 1, "role": 1, "verified_role": 1, "is_verified": 1,
+             "followers_count": 1, "following_count": 1, "created_at": 1}
+        ),
+        db.contents.aggregate(pipeline).to_list(1)
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    contents = facets[0]["contents"] if facets else []
+    totals = facets[0]["totals"][0] if facets and facets[0]["totals"] else {}
+    return user, contents, totals
+
+@api_router.get("/users/{user_id}/profile", response_model=UserProfile)
+async def get_user_profile(user_id: str, skip: int = 0, limit: int = 20):
+    if skip < 0 or not 0 < limit <= PROFILE_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {PROFILE_MAX_PAGE_SIZE}")
+    
+    # Only the query result is cached; media is attached per request so
+    # cached pages stay small
+    cache_key = (user_id, skip, limit)
+    if cache_key not in profile_cache:
+        profile_cache[cache_key] = await load_profile(user_id, skip, limit)
+    user, contents, totals = profile_cache[cache_key]
+    
+    contents = [dict(content) for content in contents]
+    await attach_media(contents)
+    
+    return UserProfile(
+        id=user_id,
+        username=user["username"],
+        role=user["role"],
+        verified_role=user.get("verified_role", user["role"]),
+        is_verified=user.get("is_verified", False),
+        followers_count=user.get("followers_count", 0),
+        following_count=user.get("following_count", 0),
+        total_uploads=totals.get("uploads", 0),
+        total_likes=totals.get("likes", 0),
+        total_comments=totals.get("comments", 0),
+        contents=[build_content(content) for content in contents],
+        created_at=user["created_at"]
+    )
+
+# Trending Routes
+@api_router.get("/trending", response_model=List[TrendingEntry])
+async def get_trending(metric: str = "likes", window: str = "day", limit: int = 20):
+    if metric not in TRENDING_METRICS or window not in TRENDING_WINDOWS:
+        raise HTTPException(status_code=400, detail="Unknown trending metric or window")
+    
+    leaders = trending.leaders(metric, window, limit)
+    contents = await load_contents([content_id for content_id, _ in leaders])
+    await attach_media(contents)
+    
+    by_id = {str(content["_id"]): content for content in contents}
+    return [
+        TrendingEntry(score=score, content=build_content(by_id[content_id]))
+        for content_id, score in leaders
+        if content_id in by_id
+    ]
+
+# Username Routes
+@api_router.put("/users/me/username", dependencies=[Depends(RateLimit("username", per="user"))])
+async def change_username(change: UsernameChange, current_user: Principal = Depends(get_current_principal)):
+    username = change.username.strip()
+    if not username:
+        raise HTTPException(status_code=400, detail="Username is required")
+    if username == current_user.username:
+        raise HTTPException(status_code=400, detail="Username unchanged")
+    
+    # The unique index settles races for the same name
+    try:
+        user = await db.users.find_one_and_update(
+            {"_id": ObjectId(current_user.id)},
+            {"$set": {"username": username}},
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Username already taken")
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    now = datetime.utcnow()
+    job = {
+        "user_id": current_user.id,
+        "old_username": current_user.username,
+        "new_username": username,
+        "status": "pending",
+        "progress": {collection: 0 for collection in USERNAME_COLLECTIONS},
+        "created_at": now,
+        "updated_at": now,
+        "lease_until": now
+    }
+    result = await db.username_jobs.insert_one(job)
+    spawn(propagate_username(result.inserted_id))
+    
+    # Tokens carry the username claim; replace them
+    await token_revocations.revoke(current_user.id)
+    invalidate_profile(current_user.id)
+    return {**await issue_tokens(user), "job_id": str(result.inserted_id)}
+
+@api_router.get("/users/me/username-jobs/{job_id}", response_model=UsernameJob)
+async def get_username_job(job_id: str, current_user: Principal = Depends(get_current_principal)):
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = await db.username_jobs.find_one({"_id": ObjectId(job_id)})
+    if not job or (job["user_id"] != current_user.id and current_user.verified_role != "admin"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return UsernameJob(
+        id=str(job["_id"]),
+        status=job["status"],
+        old_username=job["old_username"],
+        new_username=job["new_username"],
+        progress=job.get("progress", {}),
+        totals=job.get("totals", {}),
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+        finished_at=job.get("finished_at")
+    )
+
+# Follow Routes
+@api_router.post("/users/{user_id}/follow")
+async def follow_user(user_id: str, current_user: Principal = Depends(get_current_principal)):
+    if user_id == current_user.id:
+        raise HTTPException(status_code=400, detail="Cannot follow yourself")
+    
+    # Check if user exists
+    followee = await db.users.find_one({"_id": ObjectId(user_id)}, {"followers_count": 1})
+    if not followee:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Check if already following
+    existing_follow = await db.follows.find_one({"follower_id": current_user.id, "followee_id": user_id})
+    if existing_follow:
+        # Unfollow
+        await db.follows.delete_one({"follower_id": current_user.id, "followee_id": user_id})
+        await db.users.update_one({"_id": ObjectId(user_id)}, {"$inc": {"followers_count": -1}})
+        await db.users.update_one({"_id": ObjectId(current_user.id)}, {"$inc": {"following_count": -1}})
+        await db.timelines.update_one({"_id": current_user.id}, {"$pull": {"items": {"creator_id": user_id}}})
+        return {"message": "User unfollowed", "following": False}
+    else:
+        # Follow
+        try:
+            await db.follows.insert_one({
+                "follower_id": current_user.id,
+                "followee_id": user_id,
+                "created_at": datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            return {"message": "User followed", "following": True}
+        await db.users.update_one({"_id": ObjectId(user_id)}, {"$inc": {"followers_count": 1}})
+        await db.users.update_one({"_id": ObjectId(current_user.id)}, {"$inc": {"following_count": 1}})
+        
+        # Backfill the creator's latest uploads into the follower's timeline
+        if followee.get("followers_count", 0) < FANOUT_MAX_FOLLOWERS:
+            recent = await db.contents.find(
+                {"user_id": fk_match(user_id)},
+                {"user_id": 1, "created_at": 1}
+            ).sort("created_at", -1).limit(TIMELINE_BACKFILL_ITEMS).to_list(TIMELINE_BACKFILL_ITEMS)
+            if recent:
+                await db.timelines.update_one(
+                    {"_id": current_user.id},
+                    timeline_push([timeline_entry(content) for content in recent]),
+                    upsert=True
+                )
+        return {"message": "User followed", "following": True}
+
+@api_router.get("/feed/following", response_model=List[Content])
+async def get_following_feed(current_user: Principal = Depends(get_current_principal), skip: int = 0, limit: int = 20):
+    window = skip + limit
+    
+    # Fanned-out entries, newest first
+    timeline = await db.timelines.find_one({"_id": current_user.id}, {"items": {"$slice": window}})
+    entries = timeline["items"] if timeline else []
+    
+    # Merge uploads from followed creators that are read on demand
+    if large_creators.ids:
+        follows = await db.follows.find(
+            {"follower_id": current_user.id, "followee_id": {"$in": list(large_creators.ids)}},
+            {"followee_id": 1}
+        ).to_list(None)
+        if follows:
+            pulled = await db.contents.find(
+                {"user_id": fk_in([follow["followee_id"] for follow in follows])},
+                {"user_id": 1, "created_at": 1}
+            ).sort("created_at", -1).limit(window).to_list(window)
+            seen = {entry["content_id"] for entry in entries}
+            entries += [timeline_entry(content) for content in pulled if str(content["_id"]) not in seen]
+            entries.sort(key=lambda entry: entry["created_at"], reverse=True)
+    
+    contents = await load_contents([entry["content_id"] for entry in entries[skip:window]])
+    
+    await attach_media(contents)
+    return [build_content(content) for content in contents]
+
 # Badge Request Routes
 @api_router.post("/badge-requests", response_model=BadgeRequest)
-async def create_badge_request(request_data: BadgeRequestCreate, current_user: User = Depends(get_current_user)):
+async def create_badge_request(request_data: BadgeRequestCreate, current_user: Principal = Depends(get_current_principal)):
     if current_user.role != "creator":
         raise HTTPException(status_code=403, detail="Only creators can request badges")
     
@@ -548,7 +2488,7 @@ async def create_badge_request(request_data: BadgeRequestCreate, current_user: U
 
 # Label Request Routes
 @api_router.post("/label-requests", response_model=LabelRequest)
-async def create_label_request(request_data: LabelRequestCreate, current_user: User = Depends(get_current_user)):
+async def create_label_request(request_data: LabelRequestCreate, current_user: Principal = Depends(get_current_principal)):
     request_dict = {
         "user_id": current_user.id,
         "label_name": request_data.label_name,
@@ -570,7 +2510,7 @@ async def create_label_request(request_data: LabelRequestCreate, current_user: U
 
 # Admin Routes
 @api_router.get("/admin/stats", response_model=AdminStats)
-async def get_admin_stats(admin_user: User = Depends(require_admin)):
+async def get_admin_stats(request: Request, response: Response, admin_user: Principal = Depends(require_admin)):
     # Get total counts
     total_users = await db.users.count_documents({})
     total_contents = await db.contents.count_documents({})
@@ -598,6 +2538,15 @@ async def get_admin_stats(admin_user: User = Depends(require_admin)):
         "created_at": {"$gte": seven_days_ago}
     })
     
+    etag = weak_etag(
+        total_users, total_contents, pending_expert_requests, pending_label_requests,
+        sorted(users_by_role.items(), key=str), recent_registrations
+    )
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
+    
     return AdminStats(
         total_users=total_users,
         total_contents=total_contents,
@@ -608,14 +2557,19 @@ async def get_admin_stats(admin_user: User = Depends(require_admin)):
     )
 
 @api_router.get("/admin/users")
-async def get_all_users(admin_user: User = Depends(require_admin), skip: int = 0, limit: int = 50):
+async def get_all_users(admin_user: Principal = Depends(require_admin), skip: int = 0, limit: int = 50):
     users = await db.users.find().skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
     
+    # Content counts for the whole page in one aggregation
+    content_counts = Counter()
+    async for item in db.contents.aggregate([
+        {"$match": {"user_id": fk_in([str(user["_id"]) for user in users])}},
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+    ]):
+        content_counts[str(item["_id"])] += item["count"]
+    
     result = []
     for user in users:
-        # Get content count for each user
-        content_count = await db.contents.count_documents({"user_id": str(user["_id"])})
-        
         result.append(AdminUserDetails(
             id=str(user["_id"]),
             email=user["email"],
@@ -625,30 +2579,50 @@ async def get_all_users(admin_user: User = Depends(require_admin), skip: int = 0
             is_verified=user.get("is_verified", False),
             badge_status=user.get("badge_status"),
             created_at=user["created_at"],
-            content_count=content_count,
+            content_count=content_counts[str(user["_id"])],
             last_active=user.get("last_active")
         ))
     
     return result
 
 @api_router.get("/admin/pending-verifications")
-async def get_pending_verifications(admin_user: User = Depends(require_admin)):
-    # Get expert requests
-    expert_requests = await db.users.find({
+async def get_pending_verifications(admin_user: Principal = Depends(require_admin), skip: int = 0, limit: int = 20):
+    expert_query = {
         "role": "expert",
         "badge_status": "pending",
-        "verification_documents": {"$exists": True}
-    }).to_list(100)
-    
-    # Get label requests  
-    label_requests = await db.users.find({
+        "$or": [
+            {"verification_documents_blob": {"$exists": True}},
+            {"verification_documents": {"$exists": True}}
+        ]
+    }
+    label_query = {
         "role": "label",
         "badge_status": "pending"
-    }).to_list(100)
+    }
+    # Documents are fetched per user from the documents endpoint
+    summary_projection = {
+        "email": 1,
+        "username": 1,
+        "verification_description": 1,
+        "created_at": 1,
+        "updated_at": 1
+    }
+    
+    # Get expert and label requests concurrently
+    expert_requests, label_requests, expert_total, label_total = await asyncio.gather(
+        db.users.find(expert_query, summary_projection).sort("created_at", 1).skip(skip).limit(limit).to_list(limit),
+        db.users.find(label_query, summary_projection).sort("created_at", 1).skip(skip).limit(limit).to_list(limit),
+        db.users.count_documents(expert_query),
+        db.users.count_documents(label_query)
+    )
     
     result = {
         "expert_requests": [],
-        "label_requests": []
+        "label_requests": [],
+        "expert_total": expert_total,
+        "label_total": label_total,
+        "skip": skip,
+        "limit": limit
     }
     
     for user in expert_requests:
@@ -656,8 +2630,7 @@ async def get_pending_verifications(admin_user: User = Depends(require_admin)):
             "id": str(user["_id"]),
             "email": user["email"],
             "username": user["username"],
-            "verification_documents": user.get("verification_documents"),
-            "verification_description": user.get("verification_description"),
+            "verification_description": decompress_text(user.get("verification_description")),
             "created_at": user["created_at"],
             "submitted_at": user.get("updated_at", user["created_at"])
         })
@@ -672,11 +2645,31 @@ async def get_pending_verifications(admin_user: User = Depends(require_admin)):
     
     return result
 
+@api_router.get("/admin/pending-verifications/{user_id}/documents")
+async def get_verification_documents(user_id: str, admin_user: Principal = Depends(require_admin)):
+    user = await db.users.find_one(
+        {"_id": ObjectId(user_id)},
+        {"verification_documents": 1, "verification_documents_blob": 1, "verification_description": 1}
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    documents = user.get("verification_documents")
+    if user.get("verification_documents_blob"):
+        blobs = await load_blobs([user["verification_documents_blob"]])
+        documents = blobs.get(user["verification_documents_blob"])
+    
+    return {
+        "id": user_id,
+        "verification_documents": documents,
+        "verification_description": decompress_text(user.get("verification_description"))
+    }
+
 @api_router.post("/admin/verify-expert/{user_id}")
 async def verify_expert_request(
     user_id: str, 
     decision: VerificationDecision,
-    admin_user: User = Depends(require_admin)
+    admin_user: Principal = Depends(require_admin)
 ):
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
@@ -717,13 +2710,17 @@ async def verify_expert_request(
         )
         message = "Expert verification rejected"
     
+    # Access tokens carrying the old role stop working right away; the
+    # client's refresh token gets new ones with the current role
+    await token_revocations.revoke(user_id)
+    
     return {"message": message, "decision": decision.decision}
 
 @api_router.post("/admin/verify-label/{user_id}")
 async def verify_label_request(
     user_id: str,
     decision: VerificationDecision, 
-    admin_user: User = Depends(require_admin)
+    admin_user: Principal = Depends(require_admin)
 ):
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
@@ -764,10 +2761,25 @@ async def verify_label_request(
         )
         message = "Label verification rejected"
     
+    # Access tokens carrying the old role stop working right away; the
+    # client's refresh token gets new ones with the current role
+    await token_revocations.revoke(user_id)
+    
     return {"message": message, "decision": decision.decision}
 
+@api_router.get("/admin/rate-limits")
+async def get_rate_limits(admin_user: Principal = Depends(require_admin)):
+    return {
+        "backend": RATE_LIMIT_BACKEND,
+        "rules": {
+            name: {"capacity": capacity, "period_seconds": period}
+            for name, (capacity, period) in RATE_LIMIT_RULES.items()
+        },
+        "rejected": dict(rate_limit_rejections)
+    }
+
 @api_router.delete("/admin/users/{user_id}")
-async def delete_user(user_id: str, admin_user: User = Depends(require_admin)):
+async def delete_user(user_id: str, admin_user: Principal = Depends(require_admin)):
     # Prevent admin from deleting themselves
     if user_id == admin_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
@@ -780,26 +2792,54 @@ async def delete_user(user_id: str, admin_user: User = Depends(require_admin)):
     if user.get("role") == "admin":
         raise HTTPException(status_code=403, detail="Cannot delete admin users")
     
+    # Release media held by the user's contents and verification documents
+    user_contents = await db.contents.find({"user_id": fk_match(user_id)}, {"media_refs": 1}).to_list(None)
+    for content in user_contents:
+        for blob_id in content.get("media_refs", {}).values():
+            await release_blob(blob_id)
+        search_index.remove(str(content["_id"]))
+    await release_blob(user.get("verification_documents_blob"))
+    
     # Delete user and all related data
     await db.users.delete_one({"_id": ObjectId(user_id)})
-    await db.contents.delete_many({"user_id": user_id})
-    await db.comments.delete_many({"user_id": user_id})
-    await db.likes.delete_many({"user_id": user_id})
-    await db.saved_contents.delete_many({"user_id": user_id})
+    await db.contents.delete_many({"user_id": fk_match(user_id)})
+    for collection in ARCHIVED_ENGAGEMENT:
+        await db[collection].delete_many({"user_id": fk_match(user_id)})
+        await db[f"{collection}_archive"].delete_many({"user_id": fk_match(user_id)})
+    
+    # Drop follow relationships and keep the other side's counters in step
+    followees = await db.follows.distinct("followee_id", {"follower_id": user_id})
+    followers = await db.follows.distinct("follower_id", {"followee_id": user_id})
+    await db.users.update_many({"_id": {"$in": [ObjectId(i) for i in followees]}}, {"$inc": {"followers_count": -1}})
+    await db.users.update_many({"_id": {"$in": [ObjectId(i) for i in followers]}}, {"$inc": {"following_count": -1}})
+    await db.follows.delete_many({"$or": [{"follower_id": user_id}, {"followee_id": user_id}]})
+    await db.timelines.delete_one({"_id": user_id})
+    # Followers' timelines would otherwise hold entries load_contents skips
+    await db.timelines.update_many({"items.creator_id": user_id}, {"$pull": {"items": {"creator_id": user_id}}})
+    await db.username_jobs.delete_many({"user_id": user_id})
+    await token_revocations.revoke(user_id)
+    await db.refresh_tokens.delete_many({"user_id": user_id})
     
     return {"message": "User deleted successfully"}
 
 @api_router.delete("/admin/contents/{content_id}")
-async def delete_content(content_id: str, admin_user: User = Depends(require_admin)):
+async def delete_content(content_id: str, admin_user: Principal = Depends(require_admin)):
     content = await db.contents.find_one({"_id": ObjectId(content_id)})
     if not content:
         raise HTTPException(status_code=404, detail="Content not found")
     
     # Delete content and related data
     await db.contents.delete_one({"_id": ObjectId(content_id)})
-    await db.comments.delete_many({"content_id": content_id})
-    await db.likes.delete_many({"content_id": content_id})
-    await db.saved_contents.delete_many({"content_id": content_id})
+    for blob_id in content.get("media_refs", {}).values():
+        await release_blob(blob_id)
+    for collection in ARCHIVED_ENGAGEMENT:
+        await db[collection].delete_many({"content_id": fk_match(content_id)})
+        await db[f"{collection}_archive"].delete_many({"content_id": fk_match(content_id)})
+    await db.timelines.update_many({"items.content_id": content_id}, {"$pull": {"items": {"content_id": content_id}}})
+    feed_ranker.remove(content_id)
+    search_index.remove(content_id)
+    trending.remove(content_id)
+    invalidate_profile(str(content["user_id"]))
     
     return {"message": "Content deleted successfully"}
 
@@ -812,15 +2852,132 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@api_router.get("/health/live")
+async def liveness_check():
+    return {"status": "alive", "timestamp": datetime.utcnow()}
+
+@api_router.get("/health/ready")
+async def readiness_check(response: Response):
+    result = await readiness_probe.check()
+    if result["status"] != "ready":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return result
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Aggregate samples written by every worker process
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+def with_database_budget(route_app, seconds: Optional[float]):
+    async def app(scope, receive, send):
+        # Commands issued after the deadline fail instead of holding a connection
+        with pymongo.timeout(seconds):
+            await route_app(scope, receive, send)
+    return app
+
+def apply_route_budgets():
+    """Wrap every route once so its handler runs under its database budget.
+
+    Done at startup rather than per request so the budget comes with the
+    route the router already matched, with no extra pass over the routes.
+    """
+    for route in app.router.routes:
+        if not hasattr(route, "path") or not hasattr(route, "app"):
+            continue
+        timeout_ms = MONGO_ROUTE_TIMEOUTS_MS.get(route.path, MONGO_DEFAULT_TIMEOUT_MS)
+        route.app = with_database_budget(route.app, timeout_ms / 1000 if timeout_ms > 0 else None)
+
+apply_route_budgets()
+
+async def database_timeout_handler(request: Request, exc: Exception):
+    MONGO_TIMEOUTS.labels(route_label(request.scope), type(exc).__name__).inc()
+    logger.warning("%s %s timed out waiting for the database: %s", request.method, request.url.path, exc)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database temporarily unavailable, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
+for timeout_error in (ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError, WaitQueueTimeoutError):
+    app.add_exception_handler(timeout_error, database_timeout_handler)
+
+class RequestInstrumentation:
+    """Request metrics and database command tracing as a single ASGI layer.
+
+    Pure ASGI rather than @app.middleware so bodies stream through untouched
+    and each request pays for one wrapper instead of one task per layer.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        current_scope.set(scope)
+        trace = RequestTrace()
+        current_trace.set(trace)
+        status_code = 500
+        response_size = 0
+
+        async def send_and_measure(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.record(scope, status_code, elapsed, response_size, trace)
+
+    @staticmethod
+    def record(scope: dict, status_code: int, elapsed: float, response_size: int, trace: RequestTrace):
+        # Label by route template so ids in paths don't create new series
+        route = route_label(scope)
+        method = scope["method"]
+        headers = dict(scope["headers"])
+        HTTP_REQUESTS.labels(method, route, status_code).inc()
+        HTTP_LATENCY.labels(method, route).observe(elapsed)
+        HTTP_REQUEST_SIZE.labels(route).observe(int(headers.get(b"content-length", 0)))
+        HTTP_RESPONSE_SIZE.labels(route).observe(response_size)
+
+        repeated = trace.repeated()
+        if len(trace.commands) > DB_TRACE_MAX_QUERIES or trace.db_ms > DB_TRACE_MAX_MS or repeated:
+            logger.warning(
+                "%s %s issued %d database commands in %.1fms%s: %s",
+                method,
+                route,
+                len(trace.commands),
+                trace.db_ms,
+                f" (repeated: {', '.join(repeated)})" if repeated else "",
+                trace.summary()
+            )
+
+# GZip sits inside so the measured response size is what goes on the wire
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES, compresslevel=GZIP_LEVEL)
+app.add_middleware(RequestInstrumentation)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", LAST_WRITE_HEADER],
 )
 
 # Configure logging
@@ -830,6 +2987,103 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def ensure_indexes():
+    try:
+        await db.users.create_index([("email", 1)], unique=True)
+        await db.users.create_index([("username", 1)], unique=True)
+    except OperationFailure as e:
+        # register relies on these indexes alone to reject duplicate sign-ups,
+        # so refuse to serve without them
+        raise RuntimeError(
+            "Could not create unique indexes on users.email and users.username; "
+            "remove duplicate accounts and restart"
+        ) from e
+    await db.contents.create_index([("created_at", -1)])
+    await db.contents.create_index([("user_id", 1), ("created_at", -1)])
+    await db.likes.create_index([("created_at", 1)])
+    await db.saved_contents.create_index([("created_at", 1)])
+    await db.comments.create_index([("created_at", 1)])
+    # Compound indexes lead with the shard key field so they stay usable per shard
+    try:
+        await db.likes.create_index([("content_id", 1), ("user_id", 1)], unique=True)
+        await db.saved_contents.create_index([("user_id", 1), ("content_id", 1)], unique=True)
+    except OperationFailure as e:
+        # Like and save toggles rely on these indexes to reject concurrent duplicates
+        raise RuntimeError(
+            "Could not create unique indexes on likes and saved_contents; "
+            "remove duplicate likes and saves and restart"
+        ) from e
+    await db.likes.create_index([("user_id", 1)])
+    await db.saved_contents.create_index([("user_id", 1), ("created_at", -1)])
+    await db.comments.create_index([("content_id", 1), ("created_at", -1)])
+    await db.comments.create_index([("user_id", 1)])
+    await db.contents.create_index([("updated_at", 1)], sparse=True)
+    await db.username_jobs.create_index([("status", 1), ("lease_until", 1)])
+    await db.follows.create_index([("follower_id", 1), ("followee_id", 1)], unique=True)
+    await db.follows.create_index([("followee_id", 1)])
+    await db.timelines.create_index([("items.content_id", 1)])
+    await db.timelines.create_index([("items.creator_id", 1)])
+    await db.users.create_index([("followers_count", -1)])
+    try:
+        await db.events.create_index([("bucket", 1)], expireAfterSeconds=int(EVENTS_TTL_DAYS * 86400))
+    except OperationFailure:
+        # bucket_1 predates the TTL; turn it into one in place
+        await db.command("collMod", "events", index={
+            "keyPattern": {"bucket": 1}, "expireAfterSeconds": int(EVENTS_TTL_DAYS * 86400)
+        })
+    await db.likes_archive.create_index([("content_id", 1), ("user_id", 1)])
+    await db.likes_archive.create_index([("user_id", 1)])
+    await db.saved_contents_archive.create_index([("user_id", 1), ("created_at", -1)])
+    await db.saved_contents_archive.create_index([("content_id", 1), ("user_id", 1)])
+    await db.comments_archive.create_index([("content_id", 1), ("created_at", -1)])
+    await db.comments_archive.create_index([("user_id", 1)])
+    await db.refresh_tokens.create_index([("expires_at", 1)], expireAfterSeconds=0)
+    await db.feed_retractions.create_index([("removed_at", 1)], expireAfterSeconds=FEED_RETRACTION_TTL_SECONDS)
+    await db.refresh_tokens.create_index([("user_id", 1)])
+    await db.token_revocations.create_index([("expires_at", 1)], expireAfterSeconds=0)
+    await db.token_revocations.create_index([("updated_at", 1)])
+    if RATE_LIMIT_BACKEND == "mongo":
+        await db.rate_limits.create_index([("expires_at", 1)], expireAfterSeconds=0)
+
+async def warm_pool():
+    # Concurrent pings each check out their own connection
+    await asyncio.gather(*(
+        client.admin.command("ping") for _ in range(min(MONGO_WARM_CONNECTIONS, MONGO_MAX_POOL_SIZE))
+    ))
+
+@app.on_event("startup")
+async def startup_jobs():
+    if firebase_integration.FIREBASE_ENABLED:
+        await asyncio.to_thread(firebase_integration.get_app)
+    await warm_pool()
+    await ensure_indexes()
+    await refresh_legacy_string_ids()
+    await feed_ranker.refresh()
+    await large_creators.refresh()
+    await search_index.refresh()
+    await resync_trending()
+    await token_revocations.refresh()
+    run_periodic(LOOP_LAG_INTERVAL_SECONDS, loop_lag.sample)
+    run_periodic(FEED_REFRESH_SECONDS, feed_ranker.refresh)
+    run_periodic(FEED_REFRESH_SECONDS, large_creators.refresh)
+    run_periodic(SEARCH_CACHE_TTL_SECONDS, search_index.refresh)
+    run_periodic(TRENDING_RESYNC_SECONDS, resync_trending)
+    run_periodic(EVENTS_FLUSH_SECONDS, event_buffer.flush)
+    run_periodic(EVENTS_ROLLUP_SECONDS, roll_up_events)
+    run_periodic(ARCHIVE_INTERVAL_SECONDS, archive_engagement)
+    run_periodic(USERNAME_JOB_POLL_SECONDS, resume_username_jobs)
+    run_periodic(REVOCATION_REFRESH_SECONDS, token_revocations.refresh)
+    run_periodic(LEGACY_IDS_CHECK_SECONDS, refresh_legacy_string_ids)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    # Let cancelled jobs unwind, so a flush interrupted mid-write re-buffers its batch
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    if running_jobs:
+        _, pending = await asyncio.wait(set(running_jobs), timeout=SHUTDOWN_DRAIN_SECONDS)
+        if pending:
+            logger.warning("Shutting down with %d background jobs unfinished", len(pending))
+    await event_buffer.flush()
     client.close()
\ No newline at end of file
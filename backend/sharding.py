@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Sharding tool for the interaction collections
+    python sharding.py indexes   create the compound indexes the app relies on
+    python sharding.py shard     enable sharding and shard on server.SHARD_KEYS
+
+Run "python migrations.py up" before sharding: it converts string
+content_id/user_id references to ObjectIds, and once a collection is
+sharded, changing a document's shard key value needs a transaction.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from pymongo.errors import OperationFailure
+
+import server
+
+async def shard() -> dict:
+    name = server.db.name
+    try:
+        await server.client.admin.command("enableSharding", name)
+    except OperationFailure as e:
+        # Already enabled, or not connected to mongos
+        if e.code != 23:
+            raise
+    report = {}
+    for collection, key in server.SHARD_KEYS.items():
+        await server.db[collection].create_index(list(key.items()))
+        try:
+            await server.client.admin.command("shardCollection", f"{name}.{collection}", key=key)
+            report[collection] = key
+        except OperationFailure as e:
+            report[collection] = f"not sharded: {e.details.get('errmsg', e)}"
+    return report
+
+async def run(args) -> dict:
+    start = time.perf_counter()
+    if args.command == "indexes":
+        await server.ensure_indexes()
+        result = {"indexes": "ok"}
+    else:
+        result = await shard()
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["indexes", "shard"])
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2, default=str))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+API hot path benchmark
+Seeds a database at production-like scale, runs the app in-process and
+reports p50/p99 latency and throughput for the busiest routes as JSON
+
+Against a local mongod the default scale (10^5 contents, 10^6 likes) takes a
+few minutes to seed. mongomock-motor scans collections linearly, so use --mock
+with a reduced scale such as --contents 2000 --likes 20000.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Every benchmark request comes from one address and a handful of users
+os.environ.setdefault("RATE_LIMITS", "register=1000000/1,login=1000000/1,like=1000000/1,comment=1000000/1,upload=1000000/1")
+
+import httpx  # noqa: E402
+from bson import ObjectId  # noqa: E402
+# Before server: bench_db points it at the benchmark database
+from bench_db import drop_bench_database  # noqa: E402
+import server  # noqa: E402
+
+INSERT_BATCH = 10000
+SEED_DAYS = 180
+
+def zipf_index(rng, size, skew=1.2):
+    """Popularity-skewed index in [0, size): a few contents get most engagement"""
+    return min(int(rng.paretovariate(skew)) - 1, size - 1)
+
+def spread(rng, now, days=SEED_DAYS):
+    return now - timedelta(seconds=rng.uniform(0, days * 86400))
+
+async def insert_batches(collection, documents):
+    for start in range(0, len(documents), INSERT_BATCH):
+        await collection.insert_many(documents[start:start + INSERT_BATCH], ordered=False)
+
+def engagement_pairs(rng, total, contents, users):
+    """Unique (content, user) pairs with skewed content popularity"""
+    total = min(total, contents * users)
+    pairs = set()
+    while len(pairs) < total:
+        pairs.add((rng.randrange(contents) if rng.random() < 0.5 else zipf_index(rng, contents), rng.randrange(users)))
+    return pairs
+
+async def seed(args, rng):
+    db = server.db
+    now = datetime.utcnow()
+    password = server.hash_password("password123")
+
+    users = [{
+        "_id": ObjectId(),
+        "email": f"user{index}@bench.drezzle.com",
+        "username": f"user{index}",
+        "password": password,
+        "role": "creator" if index < args.creators else "listener",
+        "verified_role": "creator" if index < args.creators else "listener",
+        "is_verified": True,
+        "badge_status": "approved",
+        "created_at": spread(rng, now)
+    } for index in range(args.users)]
+    users.append({
+        "_id": ObjectId(),
+        "email": "fabio@drezzle.com",
+        "username": "admin",
+        "password": password,
+        "role": "admin",
+        "verified_role": "admin",
+        "is_verified": True,
+        "badge_status": "approved",
+        "created_at": now
+    })
+
+    likes = engagement_pairs(rng, args.likes, args.contents, args.users)
+    saves = engagement_pairs(rng, args.saves, args.contents, args.users)
+    comment_targets = [zipf_index(rng, args.contents) for _ in range(args.comments)]
+
+    # Media is stored once per distinct payload; popular clips and covers are reposted
+    def blob_pool(count, prefix, size):
+        payloads = [f"{prefix};base64,{base64.b64encode(rng.randbytes(size)).decode()}" for _ in range(count)]
+        return [{
+            "_id": server.blob_hash(data),
+            "data": data,
+            "size": len(data),
+            "ref_count": 0,
+            "created_at": spread(rng, now)
+        } for data in payloads]
+    audio_blobs = blob_pool(args.blobs, "data:audio/mpeg", args.blob_kb * 1024)
+    cover_blobs = blob_pool(args.blobs, "data:image/jpeg", args.blob_kb * 256)
+
+    def media_ref(pool):
+        blob = pool[zipf_index(rng, len(pool))]
+        blob["ref_count"] += 1
+        return blob["_id"]
+
+    likes_count = [0] * args.contents
+    for content, _ in likes:
+        likes_count[content] += 1
+    comments_count = [0] * args.contents
+    for content in comment_targets:
+        comments_count[content] += 1
+
+    contents = []
+    for index in range(args.contents):
+        creator = users[rng.randrange(args.creators)]
+        contents.append({
+            "_id": ObjectId(),
+            "user_id": creator["_id"],
+            "username": creator["username"],
+            "user_role": "creator",
+            "title": f"Track {index}",
+            "description": server.compress_text(f"Benchmark track {index} recorded live in session {index % 97}"),
+            "content_type": "audio",
+            "media_refs": {"audio_data": media_ref(audio_blobs), "cover_image": media_ref(cover_blobs)},
+            "duration": rng.randint(90, 420),
+            "likes_count": likes_count[index],
+            "comments_count": comments_count[index],
+            "created_at": spread(rng, now)
+        })
+
+    def engagement(pairs):
+        return [{
+            "content_id": contents[content]["_id"],
+            "user_id": users[user]["_id"],
+            "created_at": spread(rng, now)
+        } for content, user in pairs]
+
+    comments = [{
+        "content_id": contents[content]["_id"],
+        "user_id": users[user]["_id"],
+        "username": users[user]["username"],
+        "text": server.compress_text("Great mix, the bassline on this one is unreal"),
+        "created_at": spread(rng, now)
+    } for content, user in ((content, rng.randrange(args.users)) for content in comment_targets)]
+
+    start = time.perf_counter()
+    await insert_batches(db.users, users)
+    await insert_batches(db.media_blobs, [blob for blob in audio_blobs + cover_blobs if blob["ref_count"]])
+    await insert_batches(db.contents, contents)
+    await insert_batches(db.likes, engagement(likes))
+    await insert_batches(db.saved_contents, engagement(saves))
+    await insert_batches(db.comments, comments)
+    seed_seconds = time.perf_counter() - start
+
+    return users, contents, seed_seconds
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+async def measure(client, make_request, requests, concurrency, warmup):
+    """Run requests through a fixed pool of workers and collect latencies"""
+    for _ in range(warmup):
+        await make_request(client)
+
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await make_request(client)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+def scenarios(rng, users, contents, args):
+    def headers(user):
+        return {"Authorization": f"Bearer {server.create_access_token(server.access_claims(user))}"}
+
+    listeners = [headers(user) for user in users[:-1][:200]]
+    admin = headers(users[-1])
+    content_ids = [str(content["_id"]) for content in contents]
+    popular = lambda: content_ids[zipf_index(rng, len(content_ids))]  # noqa: E731
+    deep_page = lambda: rng.randrange(min(len(content_ids), 50 * args.page_size))  # noqa: E731
+
+    return {
+        "feed_recent": lambda c: c.get("/api/contents", params={"skip": deep_page(), "limit": args.page_size}),
+        "feed_ranked": lambda c: c.get("/api/contents", params={"sort": "ranked", "skip": deep_page(), "limit": args.page_size}),
+        "like_toggle": lambda c: c.post(f"/api/contents/{popular()}/like", headers=rng.choice(listeners)),
+        "saved_listing": lambda c: c.get("/api/saved-contents", params={"limit": args.page_size}, headers=rng.choice(listeners)),
+        "comments_listing": lambda c: c.get(f"/api/contents/{popular()}/comments", params={"limit": args.page_size}),
+        "comment_create": lambda c: c.post(f"/api/contents/{popular()}/comments", json={"text": "Benchmark comment"}, headers=rng.choice(listeners)),
+        "admin_stats": lambda c: c.get("/api/admin/stats", headers=admin),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args):
+    rng = random.Random(args.seed)
+    if args.mock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[os.environ["DB_NAME"]]
+        server.read_db = server.db
+    else:
+        await drop_bench_database()
+
+    users, contents, seed_seconds = await seed(args, rng)
+
+    # Build indexes and in-memory state the way the app does on boot
+    start = time.perf_counter()
+    await server.startup_jobs()
+    startup_seconds = time.perf_counter() - start
+
+    selected = scenarios(rng, users, contents, args)
+    if args.only:
+        selected = {name: selected[name] for name in args.only}
+
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, make_request in selected.items():
+            results[name] = await measure(client, make_request, args.requests, args.concurrency, args.warmup)
+
+    for task in server.background_tasks:
+        task.cancel()
+
+    return {
+        "revision": git_revision(),
+        "recorded_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "backend": "mongomock" if args.mock else "mongodb",
+        "dataset": {
+            "users": args.users,
+            "contents": args.contents,
+            "likes": args.likes,
+            "saves": args.saves,
+            "comments": args.comments,
+            "blobs": args.blobs,
+            "blob_kb": args.blob_kb,
+            "seed_seconds": round(seed_seconds, 2),
+            "startup_seconds": round(startup_seconds, 2),
+        },
+        "load": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "page_size": args.page_size,
+        },
+        "scenarios": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--creators", type=int, default=500)
+    parser.add_argument("--contents", type=int, default=100000)
+    parser.add_argument("--likes", type=int, default=1000000)
+    parser.add_argument("--saves", type=int, default=200000)
+    parser.add_argument("--comments", type=int, default=300000)
+    parser.add_argument("--blobs", type=int, default=2000, help="Distinct audio clips and covers shared across contents")
+    parser.add_argument("--blob-kb", type=int, default=32, help="Size of each audio clip; covers are a quarter of it")
+    parser.add_argument("--requests", type=int, default=1000, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--only", nargs="+", help="Run only these scenarios")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--mock", action="store_true", help="Use mongomock-motor instead of MONGO_URL")
+    parser.add_argument("--output", help="Write results to this file as well as stdout")
+    args = parser.parse_args()
+    args.creators = min(args.creators, args.users)
+
+    result = asyncio.run(run(args))
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Throwaway database shared by the benchmarks
+Importing this module points the backend at BENCH_DB_NAME (default
+drezzle_bench) whatever DB_NAME says, and puts the backend on sys.path.
+Import it before server.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "drezzle_bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+async def drop_bench_database():
+    """Start from an empty database, refusing any whose name doesn't mark it as a benchmark's"""
+    import server
+
+    name = os.environ["DB_NAME"]
+    if "bench" not in name:
+        raise SystemExit(f"Refusing to drop {name!r}: BENCH_DB_NAME must contain 'bench'")
+    await server.client.drop_database(name)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Storage and transfer benchmark for compressed text and document fields
+Compares raw vs stored BSON sizes, and JSON response sizes with and without
+the gzip applied to API responses
+
+Text samples are slices of real English prose: the Python documentation
+bundled with the interpreter by default, or --corpus with one real
+description or comment per line (e.g. an export of production data).
+PDFs use FlateDecode content streams like real documents do, so only
+their structure and base64 encoding are left to compress.
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "drezzle_bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import bson  # noqa: E402
+from server import GZIP_LEVEL, compress_text, decompress_text  # noqa: E402
+
+def load_sentences(corpus: str = None) -> list:
+    if corpus:
+        return [line.strip() for line in Path(corpus).read_text().splitlines() if line.strip()]
+
+    from pydoc_data.topics import topics
+    sentences = []
+    for paragraph in re.split(r"\n\s*\n", "\n".join(topics.values())):
+        # Keep prose, skip code samples and tables
+        lines = paragraph.splitlines()
+        if not lines or any(line.startswith("     ") or "|" in line or "=" * 3 in line for line in lines):
+            continue
+        text = " ".join(line.strip() for line in lines)
+        sentences.extend(sentence for sentence in re.split(r"(?<=[.!?])\s+", text) if len(sentence) > 20)
+    return sentences
+
+def sample_text(rng, sentences, min_chars, max_chars):
+    """Consecutive sentences from a random spot, like a real paragraph"""
+    target = rng.randint(min_chars, max_chars)
+    index = rng.randrange(len(sentences))
+    parts = []
+    while sum(map(len, parts)) < target:
+        parts.append(sentences[index % len(sentences)])
+        index += 1
+    return " ".join(parts)[:max_chars]
+
+def sample_pdf(rng, sentences, pages):
+    """Text PDF similar to a diploma or record label contract, with Flate-compressed pages"""
+    parts = [b"%PDF-1.4\n"]
+    for page in range(pages):
+        lines = [
+            f"BT /F1 11 Tf 72 {720 - i * 14} Td ({sample_text(rng, sentences, 60, 90)}) Tj ET"
+            for i in range(45)
+        ]
+        stream = zlib.compress("\n".join(lines).encode())
+        parts.append(f"{page + 4} 0 obj << /Length {len(stream)} /Filter /FlateDecode >> stream\n".encode())
+        parts.append(stream + b"\nendstream endobj\n")
+    parts.append(b"trailer << /Root 1 0 R >>\n%%EOF\n")
+    return b"".join(parts)
+
+def sample_scan(rng, size):
+    """Already-compressed payload such as a JPEG scan"""
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+def build_samples(rng, sentences):
+    return {
+        "verification_documents (pdf)": [
+            "data:application/pdf;base64," + base64.b64encode(sample_pdf(rng, sentences, 3)).decode()
+            for _ in range(20)
+        ],
+        "verification_documents (scan)": [
+            "data:image/jpeg;base64," + base64.b64encode(sample_scan(rng, 64 * 1024)).decode()
+            for _ in range(20)
+        ],
+        "description": [sample_text(rng, sentences, 300, 3000) for _ in range(500)],
+        "comment": [sample_text(rng, sentences, 20, 1000) for _ in range(2000)],
+    }
+
+# Values sent together in one API response
+RESPONSE_PAGE_SIZE = 20
+
+def measure(values):
+    raw_bytes = stored_bytes = 0
+    compress_time = decompress_time = 0.0
+    for value in values:
+        start = time.perf_counter()
+        stored = compress_text(value)
+        compress_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        assert decompress_text(stored) == value
+        decompress_time += time.perf_counter() - start
+
+        raw_bytes += len(bson.encode({"v": value}))
+        stored_bytes += len(bson.encode({"v": stored}))
+
+    return {
+        "samples": len(values),
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "savings_pct": round(100 * (1 - stored_bytes / raw_bytes), 1),
+        "compress_ms": round(compress_time * 1000, 2),
+        "decompress_ms": round(decompress_time * 1000, 2),
+        **measure_transfer(values),
+    }
+
+def measure_transfer(values):
+    """Bytes on the wire for pages of values as JSON, plain vs gzip at GZIP_LEVEL"""
+    json_bytes = gzip_bytes = 0
+    for start in range(0, len(values), RESPONSE_PAGE_SIZE):
+        body = json.dumps([{"text": value} for value in values[start:start + RESPONSE_PAGE_SIZE]]).encode()
+        json_bytes += len(body)
+        gzip_bytes += len(gzip.compress(body, compresslevel=GZIP_LEVEL))
+    return {
+        "json_bytes": json_bytes,
+        "gzip_bytes": gzip_bytes,
+        "transfer_savings_pct": round(100 * (1 - gzip_bytes / json_bytes), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable results")
+    parser.add_argument("--corpus", help="Text file with one real description or comment per line")
+    args = parser.parse_args()
+
+    samples = build_samples(random.Random(args.seed), load_sentences(args.corpus))
+    results = {field: measure(values) for field, values in samples.items()}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'field':32} {'raw KB':>10} {'stored KB':>10} {'saved':>7} {'comp ms':>9} {'decomp ms':>10}"
+        f" {'json KB':>10} {'gzip KB':>10} {'saved':>7}"
+    )
+    for field, result in results.items():
+        print(
+            f"{field:32} {result['raw_bytes'] / 1024:10.1f} {result['stored_bytes'] / 1024:10.1f} "
+            f"{result['savings_pct']:6.1f}% {result['compress_ms']:9.2f} {result['decompress_ms']:10.2f}"
+            f" {result['json_bytes'] / 1024:10.1f} {result['gzip_bytes'] / 1024:10.1f} {result['transfer_savings_pct']:6.1f}%"
+        )
+
+if __name__ == "__main__":
+    main()
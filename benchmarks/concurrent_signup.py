@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Concurrent sign-up load test
+Fires parallel registrations that collide on email or username and checks
+that no email or username ends up registered twice
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Registration is rate limited per client; every request here comes from one address
+os.environ.setdefault("RATE_LIMITS", "register=1000000/1")
+
+import httpx  # noqa: E402
+# Before server: bench_db points it at the benchmark database
+from bench_db import drop_bench_database  # noqa: E402
+import server  # noqa: E402
+
+async def run(identities, attempts, mock):
+    if mock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[os.environ["DB_NAME"]]
+    else:
+        await drop_bench_database()
+    await server.ensure_indexes()
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def register(identity, attempt):
+            # Half the attempts reuse the email, half reuse the username
+            payload = {
+                "email": f"user{identity}@bench.drezzle.com" if attempt % 2 == 0 else f"user{identity}.{attempt}@bench.drezzle.com",
+                "username": f"user{identity}" if attempt % 2 == 1 else f"user{identity}_{attempt}",
+                "password": "password123",
+                "role": "listener"
+            }
+            response = await client.post("/api/auth/register", json=payload)
+            return response.status_code, response.json().get("detail")
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            register(identity, attempt)
+            for identity in range(identities)
+            for attempt in range(attempts)
+        ))
+        elapsed = time.perf_counter() - start
+
+    emails = await server.db.users.aggregate([
+        {"$group": {"_id": "$email", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]).to_list(None)
+    usernames = await server.db.users.aggregate([
+        {"$group": {"_id": "$username", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]).to_list(None)
+
+    return {
+        "requests": len(results),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(results) / elapsed, 1),
+        "created": sum(1 for code, _ in results if code == 200),
+        "email_conflicts": sum(1 for code, detail in results if code == 400 and detail == "User already exists"),
+        "username_conflicts": sum(1 for code, detail in results if code == 400 and detail == "Username already taken"),
+        "duplicate_emails": len(emails),
+        "duplicate_usernames": len(usernames),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--identities", type=int, default=50)
+    parser.add_argument("--attempts", type=int, default=8, help="Parallel attempts per identity")
+    parser.add_argument("--mock", action="store_true", help="Use mongomock-motor instead of MONGO_URL")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.identities, args.attempts, args.mock))
+    print(json.dumps(result, indent=2))
+    if result["duplicate_emails"] or result["duplicate_usernames"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Read routing check against a local replica set
+Records which server answers each find and verifies that tolerant reads go
+to a secondary while a user who just wrote reads from the primary
+
+Start a three member replica set, for example:
+    mongod --replSet rs0 --port 27017 --dbpath /tmp/rs0-0
+    mongod --replSet rs0 --port 27018 --dbpath /tmp/rs0-1
+    mongod --replSet rs0 --port 27019 --dbpath /tmp/rs0-2
+    mongosh --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017"},
+        {_id: 1, host: "localhost:27018"},
+        {_id: 2, host: "localhost:27019"}]})'
+then run with MONGO_URL="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0"
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0")
+
+import httpx  # noqa: E402
+from pymongo import monitoring  # noqa: E402
+# Before server: bench_db points it at the benchmark database
+from bench_db import drop_bench_database  # noqa: E402
+import server  # noqa: E402
+
+class FindServers(monitoring.CommandListener):
+    """Address that served each find, in order"""
+
+    def __init__(self):
+        self.finds = []
+
+    def started(self, event):
+        if event.command_name == "find":
+            self.finds.append((event.command["find"], event.connection_id))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+async def run():
+    listener = FindServers()
+    server.client = server.AsyncIOMotorClient(os.environ["MONGO_URL"], event_listeners=[listener])
+    server.db = server.client[os.environ["DB_NAME"]]
+    server.read_db = server.client.get_database(os.environ["DB_NAME"], read_preference=server.read_preference)
+    await drop_bench_database()
+    await server.ensure_indexes()
+
+    hello = await server.client.admin.command("hello")
+    primary = hello["primary"]
+
+    transport = httpx.ASGITransport(app=server.app)
+    # The writer's client keeps the last-write cookie; the anonymous one never sees it
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as client, \
+            httpx.AsyncClient(transport=transport, base_url="http://check") as anonymous:
+        creator = await client.post("/api/auth/register", json={
+            "email": "routing@bench.drezzle.com", "username": "routing", "password": "password123", "role": "creator"
+        })
+        headers = {"Authorization": f"Bearer {creator.json()['access_token']}"}
+        content = await client.post("/api/contents", headers=headers, json={
+            "title": "Routing check", "content_type": "audio", "audio_data": "data:audio/mpeg;base64,AAAA"
+        })
+        content_id = content.json()["id"]
+        await client.post(f"/api/contents/{content_id}/comments", headers=headers, json={"text": "first"})
+        await client.post(f"/api/contents/{content_id}/save", headers=headers)
+
+        async def served_by(request):
+            listener.finds.clear()
+            await request
+            hosts = {f"{host}:{port}" for _, (host, port) in listener.finds}
+            return sorted(hosts)
+
+        results = {
+            "primary": primary,
+            "anonymous_feed": await served_by(anonymous.get("/api/contents")),
+            "anonymous_comments": await served_by(anonymous.get(f"/api/contents/{content_id}/comments")),
+            "writer_comments": await served_by(client.get(f"/api/contents/{content_id}/comments", headers=headers)),
+            "writer_saved": await served_by(client.get("/api/saved-contents", headers=headers)),
+        }
+
+    results["ok"] = (
+        primary not in results["anonymous_feed"]
+        and primary not in results["anonymous_comments"]
+        and results["writer_comments"] == [primary]
+        and results["writer_saved"] == [primary]
+    )
+    return results
+
+def main():
+    result = asyncio.run(run())
+    print(json.dumps(result, indent=2))
+    if not result["ok"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
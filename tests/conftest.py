@@ -0,0 +1,29 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+@pytest.fixture(scope="session")
+def server():
+    """The backend module, importable without a running database"""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("motor")
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "unit_test")
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+    return server
+
+@pytest.fixture
+def mock_db(server, monkeypatch):
+    """Point the module at a fresh in-memory database"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    client = mongomock_motor.AsyncMongoMockClient()
+    database = client["unit_test"]
+    monkeypatch.setattr(server, "client", client)
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "read_db", database)
+    return database
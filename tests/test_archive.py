@@ -0,0 +1,111 @@
+"""
+Moving old engagement into the archive collections
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+# Whole seconds, as BSON keeps only milliseconds
+OLD = (datetime.utcnow() - timedelta(days=400)).replace(microsecond=0)
+
+async def seed_likes(db, count, created_at=OLD) -> ObjectId:
+    content_id = (await db.contents.insert_one({"likes_count": count, "created_at": OLD})).inserted_id
+    await db.likes.insert_many([
+        {"content_id": content_id, "user_id": ObjectId(), "created_at": created_at + timedelta(seconds=index)}
+        for index in range(count)
+    ])
+    return content_id
+
+def test_moves_only_rows_past_the_horizon(server, mock_db, monkeypatch):
+    monkeypatch.setattr(server, "ARCHIVE_BATCH_SIZE", 2)
+    monkeypatch.setattr(server, "ARCHIVE_BATCH_PAUSE_SECONDS", 0)
+
+    async def scenario():
+        content_id = await seed_likes(mock_db, 5)
+        young = {"content_id": content_id, "user_id": ObjectId(), "created_at": datetime.utcnow()}
+        await mock_db.likes.insert_one(young)
+
+        assert await server.archive_collection("likes", server.archive_cutoff()) == 5
+        assert [like["_id"] async for like in mock_db.likes.find()] == [young["_id"]]
+        assert await mock_db.likes_archive.count_documents({}) == 5
+
+        # Pages continue from the hot rows into the archive, newest first
+        page = await server.newest_with_archive(mock_db, "likes", {"content_id": content_id}, 0, 3)
+        assert page[0]["_id"] == young["_id"]
+        assert [like["created_at"] for like in page[1:]] == [OLD + timedelta(seconds=4), OLD + timedelta(seconds=3)]
+
+        # Nothing left to move
+        assert await server.archive_collection("likes", server.archive_cutoff()) == 0
+
+    run(scenario())
+
+class UnlikeDuringRead:
+    """Database whose likes batch read races an unlike of its first row"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def __getitem__(self, name):
+        return Racing(self.db[name]) if name == "likes" else self.db[name]
+
+class Racing:
+    def __init__(self, collection):
+        self.collection = collection
+        self.cursor = None
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def find(self, *args, **kwargs):
+        self.cursor = self.collection.find(*args, **kwargs)
+        return self
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, *args, **kwargs):
+        self.cursor = self.cursor.limit(*args, **kwargs)
+        return self
+
+    async def to_list(self, length):
+        batch = await self.cursor.to_list(length)
+        if batch:
+            await self.collection.delete_one({"_id": batch[0]["_id"]})
+        return batch
+
+def test_row_removed_mid_move_is_not_archived(server, mock_db, monkeypatch):
+    monkeypatch.setattr(server, "ARCHIVE_BATCH_PAUSE_SECONDS", 0)
+
+    async def scenario():
+        await seed_likes(mock_db, 3)
+        first = await mock_db.likes.find_one(sort=[("created_at", 1)])
+        monkeypatch.setattr(server, "db", UnlikeDuringRead(mock_db))
+
+        assert await server.archive_collection("likes", server.archive_cutoff()) == 2
+        assert await mock_db.likes.count_documents({}) == 0
+        assert await mock_db.likes_archive.find_one({"_id": first["_id"]}) is None
+
+    run(scenario())
+
+def test_unlike_of_archived_like(server, mock_db):
+    async def scenario():
+        content_id = await seed_likes(mock_db, 1)
+        await server.archive_collection("likes", server.archive_cutoff())
+        content = await mock_db.contents.find_one({"_id": content_id})
+        like = await mock_db.likes_archive.find_one()
+
+        found, archived = await server.find_engagement("likes", content, str(like["user_id"]))
+        assert archived and found["_id"] == like["_id"]
+        await server.remove_archived("likes", found)
+        assert await mock_db.likes_archive.count_documents({}) == 0
+
+    run(scenario())
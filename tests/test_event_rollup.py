@@ -0,0 +1,61 @@
+"""
+Playback event buffering and the rollup into content counters
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def content(db) -> str:
+    result = await db.contents.insert_one({"title": "t", "plays_count": 0, "completions_count": 0, "created_at": datetime.utcnow()})
+    return str(result.inserted_id)
+
+def play(content_id):
+    return {"content_id": content_id, "user_id": "u", "type": "play", "created_at": datetime.utcnow()}
+
+async def age_events(db, minutes):
+    # Move every bucket back so the rollup treats them as closed
+    async for event in db.events.find():
+        await db.events.update_one({"_id": event["_id"]}, {"$set": {"bucket": event["bucket"] - timedelta(minutes=minutes)}})
+
+async def plays(db, content_id) -> int:
+    return (await db.contents.find_one({"_id": ObjectId(content_id)}))["plays_count"]
+
+def test_rollup_counts_each_event_once(server, mock_db):
+    async def scenario():
+        content_id = await content(mock_db)
+        server.event_buffer.events = [play(content_id) for _ in range(3)]
+        await server.event_buffer.flush()
+        await age_events(mock_db, 10)
+
+        await server.roll_up_events()
+        assert await plays(mock_db, content_id) == 3
+
+        # A crash before the checkpoint, or a second worker after the lease
+        # ran out, replays the same buckets
+        await mock_db.rollups.update_one({"_id": "events"}, {"$set": {"rolled_through": server.EPOCH}})
+        await server.roll_up_events()
+        assert await plays(mock_db, content_id) == 3
+    run(scenario())
+
+def test_held_back_events_land_in_an_open_bucket(server, mock_db):
+    async def scenario():
+        content_id = await content(mock_db)
+        # Buffered long ago and kept after a failed flush
+        held = play(content_id)
+        held["created_at"] -= timedelta(hours=1)
+        buffer = server.EventBuffer()
+        buffer._keep([held])
+
+        # Meanwhile the rollup moved past the bucket it arrived in
+        await server.roll_up_events()
+        rolled_through = (await mock_db.rollups.find_one({"_id": "events"}))["rolled_through"]
+
+        await buffer.flush()
+        event = await mock_db.events.find_one()
+        assert event["bucket"] >= rolled_through
+    run(scenario())
@@ -0,0 +1,96 @@
+"""
+FeedRanker: incremental refreshes, late writes and retracted engagement
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+@pytest.fixture
+def ranker(server, mock_db):
+    return server.FeedRanker(24)
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def add(db, collection, content_id, at):
+    document = {"_id": ObjectId(), "content_id": content_id, "user_id": "u", "created_at": at}
+    await db[collection].insert_one(document)
+    return document
+
+async def content(db, at):
+    result = await db.contents.insert_one({"title": "t", "created_at": at})
+    return str(result.inserted_id)
+
+def test_refresh_adds_new_engagement_once(server, ranker, mock_db):
+    async def scenario():
+        now = datetime.utcnow()
+        content_id = await content(mock_db, now - timedelta(hours=1))
+        await ranker.refresh()
+        base = ranker.scores[content_id]
+
+        await add(mock_db, "likes", content_id, datetime.utcnow())
+        await ranker.refresh()
+        liked = ranker.scores[content_id]
+        assert liked > base
+
+        # The overlap re-reads the like without counting it again
+        await ranker.refresh()
+        assert ranker.scores[content_id] == pytest.approx(liked)
+    run(scenario())
+
+def test_late_write_inside_overlap_is_scored(server, ranker, mock_db):
+    async def scenario():
+        content_id = await content(mock_db, datetime.utcnow() - timedelta(hours=1))
+        await ranker.refresh()
+        base = ranker.scores[content_id]
+
+        # Stamped before the last refresh, but inserted after it ran
+        await add(mock_db, "likes", content_id, ranker.last_refresh - timedelta(seconds=1))
+        await ranker.refresh()
+        assert ranker.scores[content_id] > base
+    run(scenario())
+
+def test_retraction_undoes_counted_engagement(server, ranker, mock_db):
+    async def scenario():
+        content_id = await content(mock_db, datetime.utcnow() - timedelta(hours=1))
+        await ranker.refresh()
+        base = ranker.scores[content_id]
+
+        save = await add(mock_db, "saved_contents", content_id, datetime.utcnow())
+        await ranker.refresh()
+        await mock_db.saved_contents.delete_one({"_id": save["_id"]})
+        await ranker.retract("saved_contents", save)
+        await ranker.refresh()
+        assert ranker.scores[content_id] == pytest.approx(base)
+
+        # Seen again through the overlap, but applied once
+        await ranker.refresh()
+        assert ranker.scores[content_id] == pytest.approx(base)
+    run(scenario())
+
+def test_retraction_of_uncounted_engagement_is_ignored(server, ranker, mock_db):
+    async def scenario():
+        content_id = await content(mock_db, datetime.utcnow() - timedelta(hours=1))
+        await ranker.refresh()
+        base = ranker.scores[content_id]
+
+        # Liked and unliked between two refreshes
+        like = await add(mock_db, "likes", content_id, datetime.utcnow())
+        await mock_db.likes.delete_one({"_id": like["_id"]})
+        await ranker.retract("likes", like)
+        await ranker.refresh()
+        assert ranker.scores[content_id] == pytest.approx(base)
+    run(scenario())
+
+def test_prune_drops_deleted_contents(server, ranker, mock_db):
+    async def scenario():
+        kept = await content(mock_db, datetime.utcnow())
+        gone = await content(mock_db, datetime.utcnow())
+        await ranker.refresh()
+        await mock_db.contents.delete_one({"_id": ObjectId(gone)})
+        await ranker.prune([kept, gone])
+        assert ranker.page(0, 10) == [kept]
+    run(scenario())
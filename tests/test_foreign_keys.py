@@ -0,0 +1,35 @@
+"""
+Lookups across the ObjectId and legacy string forms of references
+"""
+
+import asyncio
+
+from bson import ObjectId
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_legacy_form_matched_until_migrated(server, mock_db, monkeypatch):
+    monkeypatch.setattr(server, "legacy_string_ids", True)
+    value = str(ObjectId())
+
+    async def scenario():
+        await server.refresh_legacy_string_ids()
+        assert server.fk_match(value) == {"$in": [ObjectId(value), value]}
+
+        # Only migration 1 done: contents.user_id may still be a string
+        await mock_db.migrations.insert_one({"_id": 1, "status": "done"})
+        await server.refresh_legacy_string_ids()
+        assert server.legacy_string_ids
+
+        await mock_db.migrations.insert_one({"_id": 2, "status": "done"})
+        await server.refresh_legacy_string_ids()
+        assert server.fk_match(value) == ObjectId(value)
+        assert server.fk_in([value, "not-an-id"]) == {"$in": [ObjectId(value), "not-an-id"]}
+
+    run(scenario())
+
+def test_delete_filter_carries_the_shard_key(server):
+    like = {"_id": ObjectId(), "content_id": ObjectId(), "user_id": ObjectId()}
+    assert server.by_id_and_shard_key("likes", like) == {"_id": like["_id"], "content_id": like["content_id"]}
+    assert server.by_id_and_shard_key("saved_contents_archive", like) == {"_id": like["_id"], "user_id": like["user_id"]}
@@ -0,0 +1,42 @@
+"""
+Startup cost of the backend module, measured with python -X importtime
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("motor")
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+# Cumulative import time budget for server.py in microseconds
+IMPORT_TIME_BUDGET_US = int(os.environ.get("IMPORT_TIME_BUDGET_US", "3000000"))
+HEAVY_MODULES = ("firebase_admin", "google.cloud", "grpc")
+
+def import_times():
+    env = dict(os.environ, MONGO_URL="mongodb://localhost:27017", DB_NAME="import_time_test")
+    env.pop("FIREBASE_ENABLED", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+    # Lines look like "import time:       412 |       1834 |   server"
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+def test_heavy_integrations_are_not_imported():
+    loaded = [module for module in import_times() if module.startswith(HEAVY_MODULES)]
+    assert loaded == []
+
+def test_server_import_within_budget():
+    assert import_times()["server"] <= IMPORT_TIME_BUDGET_US
@@ -0,0 +1,81 @@
+"""
+Migration runner: checkpoints, resuming and legacy duplicates
+"""
+
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+@pytest.fixture
+def migrations(server):
+    import migrations
+    return migrations
+
+def args(**overrides):
+    return SimpleNamespace(**{"to": 1, "batch_size": 2, "pause": 0, "max_docs_per_second": 0, **overrides})
+
+async def string_likes(db, count) -> list:
+    result = await db.likes.insert_many([
+        {"content_id": str(ObjectId()), "user_id": str(ObjectId()), "created_at": datetime.utcnow()}
+        for _ in range(count)
+    ])
+    return result.inserted_ids
+
+async def forms(db, ids) -> list:
+    return [type((await db.likes.find_one({"_id": like_id}))["content_id"]) for like_id in ids]
+
+def test_checkpoint_after_every_batch(server, mock_db, migrations):
+    async def scenario():
+        ids = await string_likes(mock_db, 5)
+        report = await migrations.up(args())
+
+        assert report["1_interaction_references_to_object_ids"]["likes"]["modified"] == 5
+        assert await forms(mock_db, ids) == [ObjectId] * 5
+        state = await mock_db.migrations.find_one({"_id": "1:likes"})
+        assert state["last_id"] == ids[-1]
+        assert (state["matched"], state["modified"]) == (5, 5)
+        assert (await mock_db.migrations.find_one({"_id": 1}))["status"] == "done"
+
+        # Done migrations are skipped, and the lease was released
+        assert await migrations.up(args()) == {}
+
+    run(scenario())
+
+def test_resumes_from_checkpoint(server, mock_db, migrations):
+    async def scenario():
+        ids = await string_likes(mock_db, 5)
+        # A run interrupted after its first batch
+        await mock_db.migrations.insert_one({"_id": 1, "status": "running"})
+        await mock_db.migrations.insert_one({"_id": "1:likes", "last_id": ids[1], "matched": 2, "modified": 2})
+
+        await migrations.up(args())
+
+        # Anything up to the checkpoint counts as done and isn't read again
+        assert await forms(mock_db, ids) == [str, str, ObjectId, ObjectId, ObjectId]
+        state = await mock_db.migrations.find_one({"_id": "1:likes"})
+        assert (state["matched"], state["modified"], state["last_id"]) == (5, 5, ids[-1])
+
+    run(scenario())
+
+def test_legacy_duplicate_removed(server, mock_db, migrations):
+    async def scenario():
+        await mock_db.likes.create_index([("content_id", 1), ("user_id", 1)], unique=True)
+        content_id = (await mock_db.contents.insert_one({"likes_count": 2})).inserted_id
+        user_id = ObjectId()
+        kept = (await mock_db.likes.insert_one({"content_id": content_id, "user_id": user_id})).inserted_id
+        await mock_db.likes.insert_one({"content_id": str(content_id), "user_id": str(user_id)})
+
+        report = await migrations.up(args())
+
+        stats = report["1_interaction_references_to_object_ids"]["likes"]
+        assert (stats["duplicates"], stats["removed_duplicates"]) == (1, 1)
+        assert [like["_id"] async for like in mock_db.likes.find()] == [kept]
+        assert (await mock_db.contents.find_one({"_id": content_id}))["likes_count"] == 1
+
+    run(scenario())
@@ -0,0 +1,50 @@
+"""
+MemoryRateLimiter: per-worker token buckets
+"""
+
+import asyncio
+
+import pytest
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(server, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(server.time, "monotonic", clock)
+    return clock
+
+def acquire(limiter, key, capacity=3, period=60):
+    return asyncio.run(limiter.acquire(key, capacity, period))
+
+def test_allows_burst_up_to_capacity(server, clock):
+    limiter = server.MemoryRateLimiter()
+    assert [acquire(limiter, "ip") for _ in range(3)] == [0, 0, 0]
+    assert acquire(limiter, "ip") == pytest.approx(20)
+
+def test_refills_over_time(server, clock):
+    limiter = server.MemoryRateLimiter()
+    for _ in range(3):
+        acquire(limiter, "ip")
+    clock.now += 20
+    assert acquire(limiter, "ip") == 0
+    assert acquire(limiter, "ip") > 0
+
+def test_refill_is_capped_at_capacity(server, clock):
+    limiter = server.MemoryRateLimiter()
+    acquire(limiter, "ip")
+    clock.now += 3600
+    assert [acquire(limiter, "ip") for _ in range(3)] == [0, 0, 0]
+    assert acquire(limiter, "ip") > 0
+
+def test_keys_are_independent(server, clock):
+    limiter = server.MemoryRateLimiter()
+    for _ in range(3):
+        acquire(limiter, "a")
+    assert acquire(limiter, "a") > 0
+    assert acquire(limiter, "b") == 0
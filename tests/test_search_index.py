@@ -0,0 +1,47 @@
+"""
+SearchIndex: in-memory inverted index over content titles, usernames and descriptions
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+@pytest.fixture
+def index(server):
+    index = server.SearchIndex()
+    now = datetime.utcnow()
+    index.add({"_id": "1", "title": "Midnight Drive", "username": "nova", "description": None, "created_at": now})
+    index.add({"_id": "2", "title": "Morning drive", "username": "midas", "description": "Slow jazz", "created_at": now - timedelta(days=1)})
+    index.add({"_id": "3", "title": "Jazz Hands", "username": "drive_time", "description": None, "created_at": now})
+    return index
+
+def test_matches_all_terms(index):
+    assert index.search("morning drive") == ["2"]
+
+def test_last_term_is_a_prefix(index):
+    assert set(index.search("mid")) == {"1", "2"}
+    assert index.search("midn") == ["1"]
+
+def test_title_outranks_other_fields(index):
+    # "drive" in a title weighs more than in a username
+    assert index.search("drive")[:2] == ["1", "2"]
+    assert index.search("jazz") == ["3", "2"]
+
+def test_case_and_punctuation_insensitive(index):
+    assert index.search("MIDNIGHT!") == ["1"]
+    assert index.search("   ") == []
+
+def test_readding_replaces_terms(index):
+    index.add({"_id": "1", "title": "Sunrise", "username": "nova", "description": None, "created_at": datetime.utcnow()})
+    assert index.search("midnight") == []
+    assert index.search("sunrise") == ["1"]
+
+def test_remove_prunes_terms(index):
+    index.remove("1")
+    assert index.search("midnight") == []
+    assert "midnight" not in index.terms
+
+def test_suggest_prefers_common_terms(index):
+    index.add({"_id": "4", "title": "Midnight Jazz", "username": "nova", "description": None, "created_at": datetime.utcnow()})
+    assert index.suggest("dr", 5) == ["drive"]
+    assert index.suggest("mi", 1) == ["midnight"]
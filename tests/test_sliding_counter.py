@@ -0,0 +1,69 @@
+"""
+SlidingCounter: windowed per-content counts behind the trending leaderboards
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+@pytest.fixture
+def counter(server):
+    return server.SlidingCounter(timedelta(hours=1), timedelta(minutes=5))
+
+def test_counts_within_window(counter):
+    now = datetime.utcnow()
+    counter.record("a", now)
+    counter.record("a", now - timedelta(minutes=20))
+    counter.record("b", now)
+    assert counter.totals == {"a": 2, "b": 1}
+    assert counter.leaders(10) == [("a", 2), ("b", 1)]
+
+def test_ignores_events_older_than_window(counter):
+    counter.record("a", datetime.utcnow() - timedelta(hours=2))
+    assert counter.totals == {}
+
+def test_expired_buckets_drop_out(counter):
+    now = datetime.utcnow()
+    counter.record("a", now - timedelta(minutes=50))
+    counter.record("b", now)
+    counter._expire(now + timedelta(minutes=15))
+    assert counter.totals == {"b": 1}
+
+def test_decrement_of_unknown_item_leaves_no_phantom(counter):
+    now = datetime.utcnow()
+    counter.record("a", now, -1)
+    assert counter.totals == {}
+    counter._expire(now + timedelta(hours=2))
+    assert counter.totals == {}
+
+def test_decrement_in_later_bucket_survives_expiry(counter):
+    now = datetime.utcnow()
+    counter.record("a", now - timedelta(minutes=30))
+    counter.record("a", now, -1)
+    assert counter.totals == {}
+    counter._expire(now + timedelta(minutes=45))
+    assert counter.totals == {}
+
+def test_leaders_follow_increments_and_decrements(server, counter, monkeypatch):
+    monkeypatch.setattr(server, "TRENDING_TOP_K", 2)
+    now = datetime.utcnow()
+    for content_id, count in (("a", 3), ("b", 2), ("c", 1)):
+        for _ in range(count):
+            counter.record(content_id, now)
+    assert counter.leaders(5) == [("a", 3), ("b", 2)]
+
+    counter.record("c", now)
+    counter.record("c", now)
+    assert counter.leaders(5) == [("a", 3), ("c", 3)]
+
+    # A leader dropping lets the best outsider back in
+    counter.record("a", now, -1)
+    counter.record("a", now, -1)
+    assert counter.leaders(5) == [("c", 3), ("b", 2)]
+
+def test_remove(counter):
+    now = datetime.utcnow()
+    counter.record("a", now)
+    counter.record("b", now)
+    counter.remove("a")
+    assert counter.leaders(5) == [("b", 1)]
@@ -0,0 +1,81 @@
+"""
+Revoking access tokens and rotating refresh tokens
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+@pytest.fixture
+def revocations(server, mock_db, monkeypatch):
+    revocations = server.TokenRevocations()
+    monkeypatch.setattr(server, "token_revocations", revocations)
+    return revocations
+
+async def user(db, username="alice", role="listener") -> dict:
+    document = {"email": f"{username}@example.com", "username": username, "role": role, "created_at": datetime.utcnow()}
+    document["_id"] = (await db.users.insert_one(document)).inserted_id
+    return document
+
+async def principal(server, token: str):
+    return await server.get_current_principal(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+
+def test_revoked_access_token_rejected(server, mock_db, revocations):
+    async def scenario():
+        alice = await user(mock_db)
+        old = server.create_access_token(server.access_claims(alice))
+        await revocations.revoke(str(alice["_id"]))
+
+        with pytest.raises(HTTPException) as error:
+            await principal(server, old)
+        assert error.value.detail == "Token revoked"
+        # Tokens issued after the revocation still work
+        assert (await principal(server, server.create_access_token(server.access_claims(alice)))).id == str(alice["_id"])
+
+        # Other workers pick the revocation up on their next refresh
+        other = server.TokenRevocations()
+        await other.refresh()
+        assert other.is_revoked(str(alice["_id"]), (await mock_db.token_revocations.find_one())["revoked_at"])
+
+    run(scenario())
+
+def test_refresh_reissues_claims_from_the_database(server, mock_db, revocations):
+    async def scenario():
+        alice = await user(mock_db)
+        tokens = await server.issue_tokens(alice)
+        await mock_db.users.update_one({"_id": alice["_id"]}, {"$set": {"username": "alicia"}})
+        await revocations.revoke(str(alice["_id"]))
+
+        renewed = await server.refresh_access_token(server.RefreshRequest(refresh_token=tokens["refresh_token"]))
+        assert (await principal(server, renewed["access_token"])).username == "alicia"
+
+        # Refresh tokens are single use
+        with pytest.raises(HTTPException) as error:
+            await server.refresh_access_token(server.RefreshRequest(refresh_token=tokens["refresh_token"]))
+        assert error.value.status_code == 401
+
+    run(scenario())
+
+def test_deleting_a_user_revokes_their_tokens(server, mock_db, revocations):
+    async def scenario():
+        admin = await user(mock_db, "admin", "admin")
+        alice = await user(mock_db)
+        tokens = await server.issue_tokens(alice)
+
+        await server.delete_user(str(alice["_id"]), admin_user=server.Principal(
+            id=str(admin["_id"]), username="admin", role="admin", verified_role="admin"
+        ))
+
+        with pytest.raises(HTTPException):
+            await principal(server, tokens["access_token"])
+        with pytest.raises(HTTPException):
+            await server.refresh_access_token(server.RefreshRequest(refresh_token=tokens["refresh_token"]))
+        assert await mock_db.refresh_tokens.count_documents({"user_id": str(alice["_id"])}) == 0
+
+    run(scenario())
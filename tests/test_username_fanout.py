@@ -0,0 +1,80 @@
+"""
+Rewriting a renamed user's username on their contents and comments
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def rename(db, username, new_username) -> tuple:
+    user_id = (await db.users.insert_one({"username": new_username})).inserted_id
+    content_id = (await db.contents.insert_one({"user_id": user_id, "username": username, "created_at": datetime.utcnow()})).inserted_id
+    for collection in ("comments", "comments_archive"):
+        await db[collection].insert_many([
+            {"content_id": content_id, "user_id": user_id, "username": username, "text": "x", "created_at": datetime.utcnow()}
+            for _ in range(3)
+        ])
+    now = datetime.utcnow()
+    job_id = (await db.username_jobs.insert_one({
+        "user_id": str(user_id), "old_username": username, "new_username": new_username,
+        "status": "pending", "progress": {}, "created_at": now, "updated_at": now, "lease_until": now
+    })).inserted_id
+    return user_id, content_id, job_id
+
+@pytest.fixture
+def fast_fanout(server, monkeypatch):
+    monkeypatch.setattr(server, "USERNAME_FANOUT_BATCH_SIZE", 2)
+    monkeypatch.setattr(server, "USERNAME_FANOUT_PAUSE_SECONDS", 0)
+
+def test_rewrites_every_copy(server, mock_db, fast_fanout):
+    async def scenario():
+        bystander = {"user_id": ObjectId(), "username": "bob", "created_at": datetime.utcnow()}
+        await mock_db.comments.insert_one(bystander)
+        _, _, job_id = await rename(mock_db, "alice", "alicia")
+
+        await server.propagate_username(job_id)
+
+        job = await mock_db.username_jobs.find_one({"_id": job_id})
+        assert job["status"] == "done"
+        assert job["progress"] == job["totals"] == {"contents": 1, "comments": 3, "comments_archive": 3}
+        for collection in server.USERNAME_COLLECTIONS:
+            assert await mock_db[collection].count_documents({"username": "alice"}) == 0
+        assert (await mock_db.comments.find_one({"_id": bystander["_id"]}))["username"] == "bob"
+
+    run(scenario())
+
+def test_superseded_by_a_later_rename(server, mock_db, fast_fanout):
+    async def scenario():
+        user_id, _, job_id = await rename(mock_db, "alice", "alicia")
+        await mock_db.users.update_one({"_id": user_id}, {"$set": {"username": "ally"}})
+
+        await server.propagate_username(job_id)
+
+        assert (await mock_db.username_jobs.find_one({"_id": job_id}))["status"] == "superseded"
+        assert await mock_db.comments.count_documents({"username": "alicia"}) == 0
+
+    run(scenario())
+
+def test_comment_etag_changes_with_the_rename(server, mock_db, fast_fanout):
+    httpx = pytest.importorskip("httpx")
+
+    async def scenario():
+        _, content_id, job_id = await rename(mock_db, "alice", "alicia")
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            url = f"/api/contents/{content_id}/comments"
+            etag = (await client.get(url)).headers["ETag"]
+            assert (await client.get(url, headers={"If-None-Match": etag})).status_code == 304
+
+            await server.propagate_username(job_id)
+
+            response = await client.get(url, headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert {comment["username"] for comment in response.json()} == {"alicia"}
+
+    run(scenario())